@@ -0,0 +1,279 @@
+from pathlib import Path
+
+import numpy as np
+
+from analysis import inverter, transfer
+from analysis.catalog import Catalog
+from analysis.measurement import CACHE_DIR, _atomic_write, load
+from analysis.tlm import fit_line
+from analysis.transfer import pad
+
+WAFERS = (2, 5, 6)
+SUMMARY_PATH = Path(".cache/variant_summary.npz")
+QUANTILES = (0.25, 0.5, 0.75)
+
+# A device works if it switches by at least MIN_ON_OFF (TFTs) or has a gain
+# of at least MIN_GAIN (inverters, NAND gates and full adder stages).
+MIN_ON_OFF = 1e3
+MIN_GAIN = 1.0
+
+KEYS = ("l_gate", "l_overlap", "w_mesa")
+
+# Measured structures joined to each variant table of `main.py`, and the
+# parameters summarized for them. No measured structure has a resistor load, so
+# TFTs and inverters of the resistor-load full adders are joined once per
+# layout instead of once per r_type.
+STRUCTURES = {
+    "t_variants": ("transistor", "inverter", "nand", "full_adder"),
+    "r_full_adder_variants": (),
+    "r_full_adder_layouts": ("transistor", "inverter"),
+}
+PARAMETERS = {
+    "transistor": ("v_th", "mobility", "ss", "on_off"),
+    "inverter": ("max_gain", "nm"),
+    "nand": ("max_gain", "nm"),
+    "full_adder": ("max_gain", "nm"),
+}
+
+
+def variant_tables() -> dict:
+    """Return the ``t_variants`` and ``r_full_adder_variants`` of `main.py`.
+
+    Returns:
+        Mapping of table name to a mapping of column arrays. The ``r_type`` of
+        the resistor-load full adders is split into ``r_material`` and
+        ``r_squares``, and their distinct layouts form the
+        ``r_full_adder_layouts`` table.
+    """
+    import main
+
+    t = np.array(main.T_VARIANTS, dtype=float)
+    r = np.array([v[:3] for v in main.R_FULL_ADDER_VARIANTS], dtype=float)
+    return {
+        "t_variants": dict(zip(KEYS, t.T)),
+        "r_full_adder_variants": dict(
+            zip(KEYS, r.T),
+            r_material=np.array([v[3][0] for v in main.R_FULL_ADDER_VARIANTS]),
+            r_squares=np.array([v[3][1] for v in main.R_FULL_ADDER_VARIANTS]),
+        ),
+        "r_full_adder_layouts": dict(zip(KEYS, np.unique(r, axis=0).T)),
+    }
+
+
+def device_table(records, cache_dir=CACHE_DIR) -> dict:
+    """Reduce the measurements of ``records`` to one row of metrics per record.
+
+    TFT parameters come from the lowest drain voltage curve of each file, gate
+    metrics from its best supply voltage step. Resistors get their resistance
+    from the slope of the RES sweep.
+
+    Returns:
+        Mapping of arrays of length ``len(records)``: the keys ``wafer``,
+        ``structure``, ``l_gate``, ``l_overlap``, ``w_mesa`` and ``length``,
+        the TFT parameters ``v_th``, ``mobility``, ``ss`` and ``on_off``, the
+        gate metrics ``max_gain`` and ``nm`` (worst noise margin), the
+        ``resistance`` and whether the device ``works``. Unknown values are
+        NaN.
+    """
+    n = len(records)
+
+    def column(name):
+        values = [getattr(r, name) for r in records]
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+    table = {name: column(name) for name in ("wafer",) + KEYS + ("length",)}
+    table["structure"] = np.array([str(r.structure) for r in records])
+    for name in ("v_th", "mobility", "ss", "on_off", "max_gain", "nm", "resistance"):
+        table[name] = np.full(n, np.nan)
+
+    # TFTs
+    rows = np.flatnonzero(table["structure"] == "transistor")
+    curves = transfer.stack_transfer([records[i] for i in rows], cache_dir)
+    params = transfer.extract(curves)
+    curve_rows = rows[curves["record"]]
+    order = np.lexsort((curves["vd"], curve_rows))
+    measured, first = np.unique(curve_rows[order], return_index=True)
+    for name in ("v_th", "mobility", "ss"):
+        table[name][measured] = params[name][order[first]]
+    np.fmax.at(table["on_off"], curve_rows, params["on_off"])
+
+    # Logic gates
+    rows = np.flatnonzero(np.isin(table["structure"], list(PARAMETERS)[1:]))
+    vtc = inverter.stack_vtc([records[i] for i in rows], cache_dir)
+    metrics = inverter.extract(vtc)
+    curve_rows = rows[vtc["record"]]
+    np.fmax.at(table["max_gain"], curve_rows, metrics["max_gain"])
+    np.fmax.at(table["nm"], curve_rows, np.fmin(metrics["nm_h"], metrics["nm_l"]))
+
+    # Resistors
+    rows = np.array([i for i, r in enumerate(records) if "RES" in r.setups], int)
+    blocks = [load(records[i].path, cache_dir)["RES"] for i in rows]
+    if len(blocks):
+        fit = fit_line(pad([b["IK"] for b in blocks]), pad([b["VK"] for b in blocks]))
+        table["resistance"][rows] = fit["slope"]
+
+    with np.errstate(invalid="ignore"):
+        table["works"] = (
+            (table["on_off"] >= MIN_ON_OFF)
+            | (table["max_gain"] >= MIN_GAIN)
+            | (table["resistance"] > 0)
+        )
+    return table
+
+
+def group_quantiles(group, values, n_groups: int, q=QUANTILES) -> np.ndarray:
+    """Return the linearly interpolated quantiles ``q`` of ``values`` per group.
+
+    Args:
+        group: Group index per value in ``range(n_groups)``.
+        values: Values, NaN entries are ignored.
+        n_groups: Number of groups.
+        q: Quantiles in [0, 1].
+
+    Returns:
+        Array of shape (n_groups, len(q)), NaN for empty groups.
+    """
+    valid = ~np.isnan(values)
+    group, values = group[valid], values[valid]
+    order = np.lexsort((values, group))
+    values = np.append(values[order], np.nan)
+
+    count = np.bincount(group, minlength=n_groups)
+    start = np.cumsum(count) - count
+    pos = start[:, None] + np.asarray(q)[None, :] * np.maximum(count - 1, 0)[:, None]
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, start[:, None] + np.maximum(count - 1, 0)[:, None])
+    lo = np.where(count[:, None] > 0, lo, len(values) - 1)
+    hi = np.where(count[:, None] > 0, hi, len(values) - 1)
+    return values[lo] + (pos - lo) * (values[hi] - values[lo])
+
+
+def join(table: dict, rows, variants: dict, wafers=WAFERS, q=QUANTILES) -> dict:
+    """Aggregate the devices ``rows`` of ``table`` per layout variant and wafer.
+
+    Devices are matched to variants on ``l_gate``, ``l_overlap`` and
+    ``w_mesa``. Devices of other variants or wafers are ignored.
+
+    Returns:
+        Mapping with the number of measured devices ``n`` and the ``yield`` of
+        shape (n_variants, n_wafers), and the quantiles ``q`` of every table
+        parameter of shape (n_variants, n_wafers, len(q)).
+    """
+    wafers = np.asarray(wafers, dtype=float)
+    keys = np.stack([table[k][rows] for k in KEYS], axis=1)
+    rows = rows[np.isin(table["wafer"][rows], wafers) & ~np.isnan(keys).any(axis=1)]
+    keys = np.stack([table[k][rows] for k in KEYS], axis=1)
+
+    v_keys = np.stack([variants[k] for k in KEYS], axis=1)
+    unique, inverse = np.unique(
+        np.concatenate([v_keys, keys]), axis=0, return_inverse=True
+    )
+    inverse = inverse.ravel()
+    v_index, d_index = inverse[: len(v_keys)], inverse[len(v_keys) :]
+
+    n_cells = len(unique) * len(wafers)
+    cell = d_index * len(wafers) + np.searchsorted(wafers, table["wafer"][rows])
+    shape = (len(unique), len(wafers))
+
+    n = np.bincount(cell, minlength=n_cells).reshape(shape)
+    works = np.bincount(cell, table["works"][rows], minlength=n_cells).reshape(shape)
+    with np.errstate(invalid="ignore"):
+        result = {"n": n[v_index], "yield": (works / n)[v_index]}
+
+    for name in ("v_th", "mobility", "ss", "on_off", "max_gain", "nm"):
+        quantiles = group_quantiles(cell, table[name][rows], n_cells, q)
+        result[name] = quantiles.reshape(shape + (len(q),))[v_index]
+    return result
+
+
+def aggregate(table: dict, tables=None, wafers=WAFERS) -> dict:
+    """Join the device table to the layout variant tables of `main.py`.
+
+    Args:
+        table: Device table as returned by `device_table`.
+        tables: Variant tables, defaults to `variant_tables`.
+        wafers: Wafers to aggregate.
+
+    Returns:
+        Mapping of variant table name to its columns, the ``wafer`` list and,
+        for every structure of `STRUCTURES`, its ``n`` and ``yield`` and the
+        quantiles of its `PARAMETERS`, keyed ``"<structure>.<name>"``. Resistor
+        load full adders also get the ``r_expected`` load resistance per wafer
+        from the measured ITO sheet resistance (NaN for tungsten).
+    """
+    tables = tables if tables is not None else variant_tables()
+    wafers = np.asarray(wafers, dtype=float)
+
+    summary = {}
+    for name, variants in tables.items():
+        result = dict(variants, wafer=wafers)
+        for structure in STRUCTURES[name]:
+            rows = np.flatnonzero(table["structure"] == structure)
+            joined = join(table, rows, variants, wafers)
+            for key in ("n", "yield") + PARAMETERS[structure]:
+                result[f"{structure}.{key}"] = joined[key]
+
+        if "r_material" in variants:
+            rows = np.flatnonzero(table["structure"] == "resistor_ito")
+            rows = rows[np.isin(table["wafer"][rows], wafers)]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                r_sh = table["resistance"][rows] / table["length"][rows]
+            index = np.searchsorted(wafers, table["wafer"][rows])
+            r_sh = group_quantiles(index, r_sh, len(wafers), (0.5,))[:, 0]
+            ito = variants["r_material"] == "ITO"
+            result["r_expected"] = np.where(
+                ito[:, None], variants["r_squares"][:, None] * r_sh[None, :], np.nan
+            )
+        summary[name] = result
+    return summary
+
+
+def save_summary(summary: dict, path=SUMMARY_PATH):
+    """Write ``summary`` as one compressed ``.npz`` with ``table/column`` keys."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        f"{name}/{key}": value
+        for name, columns in summary.items()
+        for key, value in columns.items()
+    }
+    _atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+
+
+def load_summary(path=SUMMARY_PATH) -> dict:
+    """Read a summary written by `save_summary`."""
+    summary = {}
+    with np.load(path) as data:
+        for key in data.files:
+            name, column = key.split("/", 1)
+            summary.setdefault(name, {})[column] = data[key]
+    return summary
+
+
+def build(catalog: Catalog | None = None, cache_dir=CACHE_DIR, path=SUMMARY_PATH):
+    """Aggregate the latest measurement of every device and save the summary."""
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    table = device_table(catalog.query(latest=True), cache_dir)
+    summary = aggregate(table)
+    if path is not None:
+        save_summary(summary, path)
+    return summary
+
+
+if __name__ == "__main__":
+    summary = build()
+
+    for name, result in summary.items():
+        print(f"{name}: {len(result['l_gate'])} variants")
+        for structure in STRUCTURES[name]:
+            n = result[f"{structure}.n"]
+            measured = np.argwhere(n > 0)
+            for v, w in measured:
+                variant = "/".join(f"{result[k][v]:g}" for k in KEYS)
+                if "r_material" in result:
+                    variant += f" {result['r_material'][v]} {result['r_squares'][v]:g}"
+                print(
+                    f"  wafer {result['wafer'][w]:g} {structure:10s} {variant:18s} "
+                    f"n {n[v, w]}  "
+                    f"yield {result[f'{structure}.yield'][v, w]:4.0%}"
+                )
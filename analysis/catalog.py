@@ -0,0 +1,315 @@
+import re
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from analysis.measurement import CACHE_DIR, DATA_DIR, load
+from pdk.components import compute_l_mesa
+
+# Multi-word tokens of the file naming scheme, matched before splitting on "_".
+_TOKEN = re.compile(
+    r"gated_tlm|ito_on_w_tlm|niau_on_ito_tlm|ito_res|near_design|no_light"
+    r"|higher_v|floating_gate|[^_]+"
+)
+_NOT = re.compile(r"(up|down|\d+v|annealforming|anneal)?(not|inv)")
+
+_STRUCTURES = {
+    "transistor": "transistor",
+    "tft": "transistor",
+    "nand": "nand",
+    "fulladder": "full_adder",
+    "gated_tlm": "gated_tlm",
+    "ito_on_w_tlm": "ito_on_w_tlm",
+    "niau_on_ito_tlm": "niau_on_ito_tlm",
+    "ito_res": "resistor_ito",
+    "via": "via",
+    "floating_gate": "floating_gate",
+}
+
+# Number of "_"-separated numeric parameters following each structure name
+_N_NUMBERS = {
+    "transistor": 3,
+    "inverter": 3,
+    "nand": 3,
+    "full_adder": 3,
+    "resistor_ito": 2,
+}
+
+# Tags that mark a repeated measurement rather than a different device or
+# measurement condition. They are dropped from the device key.
+_REPEAT_TAGS = {"reprobe", "reprobed", "rerun", "good", "bad"}
+
+# Layout cell in `main.py` each structure is measured on.
+_CELLS = {
+    "transistor": ("transistor_test", None),
+    "inverter": ("inverter_test", 1),
+    "nand": ("inverter_test", 2),
+    "full_adder": ("full_adder", None),
+    "resistor_ito": ("resistor_ito_test", None),
+}
+
+
+class Record(NamedTuple):
+    path: str
+    wafer: int | None
+    anneal: str | None
+    anneal_temp: float | None
+    structure: str | None
+    l_gate: float | None
+    l_overlap: float | None
+    w_mesa: float | None
+    length: float | None
+    remeasure: int
+    tags: tuple[str, ...]
+    device: str
+    timestamp: datetime | None
+    setups: tuple[str, ...]
+    # Layout parameters of the matching cell in `main.py`
+    cell: str | None
+    n_transistors: int | None
+    l_mesa: float | None
+
+    @property
+    def cell_kwargs(self) -> dict | None:
+        """Return the keyword arguments of the layout cell of this record."""
+        if self.cell in ("transistor_test", "full_adder"):
+            return dict(
+                l_gate=self.l_gate, l_overlap=self.l_overlap, w_mesa=self.w_mesa
+            )
+        if self.cell == "inverter_test":
+            return dict(
+                l_gate=self.l_gate,
+                l_overlap=self.l_overlap,
+                w_mesa=self.w_mesa,
+                n_transistors=self.n_transistors,
+            )
+        if self.cell == "resistor_ito_test":
+            return dict(length=self.length)
+        return None
+
+
+def layout_cell(record: Record):
+    """Build the layout cell of ``record`` with the generators of `main.py`."""
+    import main
+
+    return getattr(main, record.cell)(**record.cell_kwargs)
+
+
+def _number(token: str) -> float:
+    value = float(token)
+    return int(value) if value.is_integer() else value
+
+
+def parse_name(path) -> dict:
+    """Parse the measurement parameters encoded in a ``.dat`` file path.
+
+    Examples of supported names are ``wafer_05_inv_10_20_100_up``,
+    ``250c_n2_NOT_5_2_20_remeasured_3``, ``wafer_02_gated_tlm_10um_near_design``
+    and ``ito_res_0_005_sq``. The wafer is taken from a ``waferN`` directory if
+    it is not part of the name.
+    """
+    path = Path(path)
+    tokens = _TOKEN.findall(path.stem.lower())
+
+    info = dict(
+        wafer=None,
+        anneal=None,
+        anneal_temp=None,
+        structure=None,
+        l_gate=None,
+        l_overlap=None,
+        w_mesa=None,
+        length=None,
+        remeasure=0,
+        tags=[],
+    )
+    for part in path.parent.parts:
+        if m := re.fullmatch(r"wafer_?(\d+)", part):
+            info["wafer"] = int(m[1])
+
+    numbers = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+
+        if token == "wafer" and nxt.isdigit():
+            info["wafer"] = int(nxt)
+            i += 1
+        elif m := re.fullmatch(r"(\d+)c", token):
+            info["anneal_temp"] = float(m[1])
+            if nxt in ("n2", "fg"):
+                info["anneal"] = nxt
+                i += 1
+        elif m := _NOT.fullmatch(token):
+            info["structure"] = "inverter"
+            if m[1] == "annealforming":
+                info["anneal"] = "fg"
+            elif m[1] == "anneal":
+                info["anneal"] = "unknown"
+            elif m[1]:
+                info["tags"].append(m[1])
+        elif token == "nand" and info["structure"] == "transistor":
+            # Single TFT of a NAND gate
+            info["tags"].append(token)
+        elif token in _STRUCTURES:
+            info["structure"] = _STRUCTURES[token]
+        elif token in ("remeasure", "remeasured", "rerun"):
+            info["remeasure"] = 1
+            if nxt.isdigit():
+                info["remeasure"] = int(nxt)
+                i += 1
+            if token == "rerun":
+                info["tags"].append(token)
+        elif token == "sq":
+            pass
+        elif m := re.fullmatch(r"(\d+)um", token):
+            info["length"] = float(m[1])
+        elif info["structure"] == "via" and (m := re.fullmatch(r"l(\d+)", token)):
+            info["length"] = float(m[1])
+        elif token.isdigit():
+            if len(numbers) < _N_NUMBERS.get(info["structure"], 0):
+                numbers.append(token)
+            else:
+                # A bare number after the parameters counts the repeats
+                info["remeasure"] = int(token)
+        else:
+            info["tags"].append(token)
+        i += 1
+
+    if info["structure"] == "resistor_ito":
+        info["length"] = _number(".".join(numbers[:2]))
+    elif len(numbers) == 3:
+        info["l_gate"], info["l_overlap"], info["w_mesa"] = map(_number, numbers[:3])
+
+    info["tags"] = tuple(info["tags"])
+    return info
+
+
+def _device_key(info: dict) -> str:
+    params = [info[k] for k in ("l_gate", "l_overlap", "w_mesa", "length")]
+    tags = [t for t in info["tags"] if t not in _REPEAT_TAGS]
+    return "/".join(
+        [
+            f"wafer{info['wafer']}",
+            f"{info['anneal']}{info['anneal_temp'] or ''}",
+            str(info["structure"]),
+            "_".join(str(p) for p in params if p is not None),
+            "_".join(tags),
+        ]
+    )
+
+
+def make_record(path, cache_dir=CACHE_DIR) -> Record:
+    """Return the catalog record of a ``.dat`` file."""
+    info = parse_name(path)
+    measurement = load(path, cache_dir)
+
+    timestamp = None
+    if measurement.blocks and measurement.blocks[0].date:
+        first = measurement.blocks[0]
+        timestamp = datetime.strptime(f"{first.date} {first.time}", "%m/%d/%Y %H:%M:%S")
+
+    cell, n_transistors = _CELLS.get(info["structure"], (None, None))
+    if "nand" in info["tags"]:
+        cell, n_transistors = _CELLS["nand"]
+    l_mesa = None
+    if info["l_gate"] is not None:
+        l_mesa = compute_l_mesa(info["l_gate"], info["l_overlap"])
+    elif cell != "resistor_ito_test":
+        cell, n_transistors = None, None
+
+    return Record(
+        path=str(path),
+        device=_device_key(info),
+        timestamp=timestamp,
+        setups=tuple(measurement.setups),
+        cell=cell,
+        n_transistors=n_transistors,
+        l_mesa=l_mesa,
+        **info,
+    )
+
+
+class Catalog:
+    """Indexed table of measurement files.
+
+    Every field of `Record` can be queried by equality. Lookups on the
+    categorical fields go through hash indices built once on construction.
+
+    Example:
+        >>> catalog = Catalog.build()
+        >>> catalog.query(structure="inverter", l_gate=5, wafer=6, anneal="n2",
+        ...               latest=True)
+    """
+
+    INDEXED = (
+        "path",
+        "wafer",
+        "anneal",
+        "structure",
+        "l_gate",
+        "l_overlap",
+        "w_mesa",
+        "length",
+        "device",
+        "cell",
+    )
+
+    def __init__(self, records=()):
+        self.records = list(records)
+        self._rows = np.arange(len(self.records))
+        self._index = {name: defaultdict(list) for name in self.INDEXED}
+        for row, record in enumerate(self.records):
+            for name in self.INDEXED:
+                self._index[name][getattr(record, name)].append(row)
+        self._index = {
+            name: {k: np.array(v) for k, v in index.items()}
+            for name, index in self._index.items()
+        }
+
+        latest = {}
+        for row, record in enumerate(self.records):
+            key = (record.timestamp or datetime.min, record.remeasure)
+            if record.device not in latest or key > latest[record.device][0]:
+                latest[record.device] = (key, row)
+        self._latest = np.zeros(len(self.records), dtype=bool)
+        self._latest[[row for _, row in latest.values()]] = True
+
+    @classmethod
+    def build(cls, root=DATA_DIR, cache_dir=CACHE_DIR) -> "Catalog":
+        """Build the catalog of all ``.dat`` files below ``root``."""
+        return cls(make_record(p, cache_dir) for p in sorted(Path(root).rglob("*.dat")))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, i) -> Record:
+        return self.records[i]
+
+    def rows(self, latest: bool = False, **criteria) -> np.ndarray:
+        """Return the row numbers of records matching all ``criteria``."""
+        mask = self._latest.copy() if latest else np.ones(len(self.records), bool)
+        for name, value in criteria.items():
+            if name in self._index:
+                hit = np.zeros(len(self.records), bool)
+                hit[self._index[name].get(value, [])] = True
+            else:
+                hit = np.array([getattr(r, name) == value for r in self.records], bool)
+            mask &= hit
+        return self._rows[mask]
+
+    def query(self, latest: bool = False, **criteria) -> list[Record]:
+        """Return the records matching all ``criteria``.
+
+        Args:
+            latest: Only return the most recent measurement of each device.
+            criteria: Field name / value pairs, e.g. ``structure="inverter"``.
+        """
+        return [self.records[i] for i in self.rows(latest=latest, **criteria)]
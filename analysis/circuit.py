@@ -0,0 +1,368 @@
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+
+from pdk.layer_stack import layer_stack
+
+EPS_0 = 8.854e-12  # F/m
+EPS_AL2O3 = 9.0
+
+# Sheet resistances of the two resistor materials (Ohm / square).
+SHEET_RESISTANCE = {
+    "W": 20.0,  # 10nm tungsten meander (`resistor`)
+    "ITO": 2e6,  # 3nm ungated ITO (`resistor_ito`)
+}
+
+
+def gate_capacitance() -> float:
+    """Return the Al2O3 gate capacitance per area in F/m^2."""
+    thickness = layer_stack.layers["AL2O3"].thickness * 1e-6
+    return EPS_0 * EPS_AL2O3 / thickness
+
+
+@dataclass(frozen=True)
+class TFTModel:
+    """Symmetric EKV-style compact model of the ITO TFT.
+
+    Above threshold and with the default ``gamma`` and ``r_c`` the model
+    reduces to the square law ``beta / 2 * ((Vgs - Vth)^2 - (Vgd - Vth)^2)``,
+    below threshold the current falls off with the given subthreshold swing.
+    A mobility that grows as ``(Vgs - Vth)^gamma`` turns the square law into a
+    power law, and the contact resistance degrades the channel current to
+    first order, ``I = I_channel / (1 + R_c * g_channel)``.
+
+    Args:
+        mobility: Field-effect mobility in cm^2/Vs, at 1 V overdrive if
+            ``gamma`` is not 0.
+        v_th: Threshold voltage in V.
+        ss: Subthreshold swing in V/decade.
+        gamma: Mobility enhancement exponent.
+        r_c: Total source and drain contact resistance times width in Ohm cm.
+    """
+
+    mobility: float = 2.0
+    v_th: float = 1.0
+    ss: float = 0.2
+    gamma: float = 0.0
+    r_c: float = 0.0
+
+    def beta(self, w, l):
+        """Return the transconductance parameter in A/V^2 for channel w x l."""
+        return self.mobility * 1e-4 * gate_capacitance() * np.asarray(w) / l
+
+    def theta(self, l):
+        """Return ``R_c * beta`` in 1/V for channel length l, independent of w."""
+        r_c = self.r_c * 1e-2  # Ohm m
+        return r_c * self.mobility * 1e-4 * gate_capacitance() / (np.asarray(l) * 1e-6)
+
+    def current(self, beta, v_g, v_s, v_d, theta=0.0):
+        """Return the s->d channel current and its derivatives w.r.t. v_g, v_s, v_d.
+
+        All arguments broadcast against each other. ``theta`` is the contact
+        resistance term of `theta`.
+        """
+        f_s, df_s, _ = overdrive(v_g - v_s - self.v_th, self.ss)
+        f_d, df_d, _ = overdrive(v_g - v_d - self.v_th, self.ss)
+        i, di_s, di_d, _, _ = channel_current(f_s, f_d, 2 + self.gamma, beta, theta)
+
+        # The d->s current of `channel_current`, chained through f_s and f_d
+        di_s, di_d = -di_s * df_s, -di_d * df_d
+        return -i, di_s + di_d, -di_s, -di_d
+
+
+def overdrive(v, ss):
+    """Return the smoothed gate overdrive of one channel end and its derivatives.
+
+    ``f = a * ln(1 + exp(v / a))`` with ``a = 2 * ss / ln(10)`` (2 n U_T)
+    follows ``v = V_g - V_th`` above threshold and falls off with the
+    subthreshold swing ``ss`` below.
+
+    Returns:
+        ``f`` and its derivatives with respect to ``v`` and ``ss``.
+    """
+    a = 2 * ss / np.log(10)
+    x = np.maximum(v / a, -700)  # keeps f and log(f) finite
+    soft = np.logaddexp(0, x)
+    sig = np.exp(x - soft)
+    f = a * soft
+    return f, sig, (f - v * sig) / ss
+
+
+def channel_current(f_s, f_d, m, beta, theta=0.0):
+    """Return the d->s channel current of `TFTModel` and its partial derivatives.
+
+    ``i = beta / (m * d) * (f_s^m - f_d^m)`` with the contact resistance
+    degradation ``d = 1 + theta * (f_s^(m - 1) + f_d^(m - 1)) / 2``, where
+    ``f_s`` and ``f_d`` are the positive `overdrive` at source and drain. The
+    current is positive for an n-type TFT with V_ds > 0.
+
+    Returns:
+        ``i`` and its derivatives with respect to ``f_s``, ``f_d``, ``m`` and
+        ``theta``.
+    """
+    g_s, g_d = f_s ** (m - 1), f_d ** (m - 1)
+    p = f_s * g_s - f_d * g_d
+    q = (g_s + g_d) / 2
+    d = 1 + theta * q
+    k = beta / (m * d)
+    i = k * p
+
+    log_s, log_d = np.log(f_s), np.log(f_d)
+    dp_dm = f_s * g_s * log_s - f_d * g_d * log_d
+    dq_dm = (g_s * log_s + g_d * log_d) / 2
+    return (
+        i,
+        k * (m * g_s - p * theta * (m - 1) / 2 * f_s ** (m - 2) / d),
+        -k * (m * g_d + p * theta * (m - 1) / 2 * f_d ** (m - 2) / d),
+        k * (dp_dm - p / m - p * theta * dq_dm / d),
+        -i * q / d,
+    )
+
+
+def resistance(r_type) -> float:
+    """Return the resistance in Ohm of a `full_adder` ``r_type`` load."""
+    material, squares = r_type
+    return squares * SHEET_RESISTANCE[material]
+
+
+def solve_dc(
+    nodes,
+    transistors,
+    resistors,
+    fixed,
+    beta,
+    r,
+    model: TFTModel = TFTModel(),
+    theta=0.0,
+    g_min: float = 1e-12,
+    tol: float = 1e-7,
+    max_iter: int = 200,
+    max_step: float = 0.5,
+):
+    """Solve the DC operating point of a batch of resistor-load TFT circuits.
+
+    The circuit topology is shared across the batch, while all voltages and
+    device parameters may vary per batch element. Newton's method is run on
+    every circuit simultaneously.
+
+    Args:
+        nodes: Names of the unknown nodes.
+        transistors: Sequence of (name, gate, s, d) node names.
+        resistors: Sequence of (name, node_1, node_2) node names.
+        fixed: Mapping of fixed node name to voltage (array-like).
+        beta: Transconductance parameter per transistor, shape (..., n_t).
+        r: Resistance per resistor, shape (..., n_r).
+        model: TFT compact model.
+        theta: Contact resistance term per transistor (see `TFTModel.theta`),
+            broadcast against ``beta``.
+        g_min: Conductance from every unknown node to ground, for stability.
+        tol: Convergence tolerance on the voltage update in V.
+        max_iter: Maximum number of Newton iterations.
+        max_step: Maximum voltage update per iteration in V.
+
+    Returns:
+        Mapping of node name to voltage for all unknown and fixed nodes.
+    """
+    names = list(nodes) + list(fixed)
+    index = {name: i for i, name in enumerate(names)}
+    n = len(nodes)
+
+    def incidence(terminals):
+        m = np.zeros((len(terminals), len(names)))
+        m[np.arange(len(terminals)), [index[t] for t in terminals]] = 1
+        return m[:, :n]
+
+    t_g, t_s, t_d = (np.array([index[t[k]] for t in transistors]) for k in (1, 2, 3))
+    r_1, r_2 = (np.array([index[x[k]] for x in resistors]) for k in (1, 2))
+    m_g, m_s, m_d = (incidence([t[k] for t in transistors]) for k in (1, 2, 3))
+    m_1, m_2 = (incidence([x[k] for x in resistors]) for k in (1, 2))
+
+    beta = np.asarray(beta, dtype=float)
+    g = 1 / np.asarray(r, dtype=float)
+    v_fixed = [np.asarray(v, dtype=float) for v in fixed.values()]
+    shape = np.broadcast_shapes(
+        beta.shape[:-1], g.shape[:-1], *(v.shape for v in v_fixed)
+    )
+    beta = np.broadcast_to(beta, shape + beta.shape[-1:])
+    theta = np.broadcast_to(theta, beta.shape)
+    g = np.broadcast_to(g, shape + g.shape[-1:])
+    v_fixed = np.stack([np.broadcast_to(v, shape) for v in v_fixed], axis=-1)
+
+    v = np.full(shape + (n,), v_fixed.max(initial=0) / 2)
+    identity = g_min * np.eye(n)
+
+    for _ in range(max_iter):
+        v_all = np.concatenate([v, v_fixed], axis=-1)
+
+        i_t, di_g, di_s, di_d = model.current(
+            beta, v_all[..., t_g], v_all[..., t_s], v_all[..., t_d], theta
+        )
+        i_r = g * (v_all[..., r_1] - v_all[..., r_2])
+
+        # Current leaving each unknown node
+        f = i_t @ (m_s - m_d) + i_r @ (m_1 - m_2) + g_min * v
+        jac = (
+            np.einsum("ti,...tj->...ij", m_s - m_d, di_g[..., None] * m_g)
+            + np.einsum("ti,...tj->...ij", m_s - m_d, di_s[..., None] * m_s)
+            + np.einsum("ti,...tj->...ij", m_s - m_d, di_d[..., None] * m_d)
+            + np.einsum("ri,...r,rj->...ij", m_1 - m_2, g, m_1 - m_2)
+            + identity
+        )
+
+        dv = np.linalg.solve(jac, -f[..., None])[..., 0]
+        dv = np.clip(dv, -max_step, max_step)
+        v = v + dv
+
+        if np.abs(dv).max(initial=0) < tol:
+            break
+
+    v_all = np.concatenate([v, v_fixed], axis=-1)
+    return {name: v_all[..., i] for name, i in index.items()}
+
+
+## Full Adder
+
+# Netlist extracted from the routing in `main.full_adder`. Transistor terminals
+# use the port names of `padded_transistor` ("s" faces the resistor load).
+FULL_ADDER_NODES = ("nc", "n1", "n3", "cout", "ns", "n4", "n6", "n7", "s")
+
+FULL_ADDER_TRANSISTORS = (
+    # name, gate, s, d
+    ("m_0", "c", "nc", "n1"),
+    ("m_1", "a", "n1", "gnd"),
+    ("m_2", "b", "n1", "gnd"),
+    ("m_3", "a", "nc", "n3"),
+    ("m_4", "b", "n3", "gnd"),
+    ("m_5", "nc", "ns", "n4"),
+    ("m_6", "a", "n4", "gnd"),
+    ("m_7", "b", "n4", "gnd"),
+    ("m_8", "c", "n4", "gnd"),
+    ("m_9", "a", "ns", "n6"),
+    ("m_10", "c", "n6", "n7"),
+    ("m_11", "b", "n7", "gnd"),
+    ("m_12", "ns", "s", "gnd"),
+    ("m_13", "nc", "cout", "gnd"),
+)
+
+FULL_ADDER_RESISTORS = (
+    # name, node_1, node_2
+    ("r_0", "vdd", "nc"),
+    ("r_1", "vdd", "ns"),
+    ("r_2", "vdd", "s"),
+    ("r_3", "vdd", "cout"),
+)
+
+FULL_ADDER_INPUTS = np.array(list(itertools.product([0, 1], repeat=3)))
+
+
+def simulate_full_adder(
+    l_gate,
+    l_overlap,
+    w_mesa,
+    r_type,
+    vdd: float = 5.0,
+    disabled=None,
+    model: TFTModel = TFTModel(),
+):
+    """Simulate `full_adder` variants for all eight input vectors at once.
+
+    Args:
+        l_gate: Gate length per variant, shape (n,).
+        l_overlap: Gate overlap per variant, shape (n,). Only carried through,
+            the compact model has no overlap dependence.
+        w_mesa: Channel width per variant, shape (n,).
+        r_type: Sequence of n load resistor types as passed to `full_adder`.
+        vdd: Supply and logic-high input voltage.
+        disabled: Names of transistors without ITO channel.
+        model: TFT compact model.
+
+    Returns:
+        Mapping with the ``s`` and ``cout`` output voltages, the static supply
+        current ``i_dd`` (all of shape (n, 8), ordered as `FULL_ADDER_INPUTS`)
+        and the expected logic ``s_ref`` and ``cout_ref`` of shape (8,).
+    """
+    l_gate = np.atleast_1d(np.asarray(l_gate, dtype=float))
+    w_mesa = np.atleast_1d(np.asarray(w_mesa, dtype=float))
+    l_gate, l_overlap, w_mesa = np.broadcast_arrays(l_gate, l_overlap, w_mesa)
+    r = np.array([resistance(x) for x in r_type], dtype=float)
+
+    enabled = np.array([t[0] not in (disabled or []) for t in FULL_ADDER_TRANSISTORS])
+    beta = model.beta(w_mesa, l_gate)[:, None] * enabled
+    theta = np.broadcast_to(model.theta(l_gate)[:, None], beta.shape)
+    r = np.repeat(r[:, None], len(FULL_ADDER_RESISTORS), axis=1)
+
+    a, b, c = (FULL_ADDER_INPUTS[:, k] * vdd for k in range(3))
+    v = solve_dc(
+        FULL_ADDER_NODES,
+        FULL_ADDER_TRANSISTORS,
+        FULL_ADDER_RESISTORS,
+        {"a": a, "b": b, "c": c, "vdd": vdd, "gnd": 0.0},
+        beta[:, None, :],
+        r[:, None, :],
+        model=model,
+        theta=theta[:, None, :],
+    )
+
+    i_dd = sum(
+        (v["vdd"] - v[node]) / r[:, [k]]
+        for k, (_, _, node) in enumerate(FULL_ADDER_RESISTORS)
+    )
+    total = FULL_ADDER_INPUTS.sum(axis=1)
+    return {
+        "s": v["s"],
+        "cout": v["cout"],
+        "i_dd": i_dd,
+        "s_ref": total % 2,
+        "cout_ref": total // 2,
+    }
+
+
+def noise_margin(v_out, ref, vdd: float = 5.0):
+    """Return the worst-case distance of the outputs from the logic threshold.
+
+    The margin is normalized to ``vdd / 2`` and reduced over the last axis. It
+    is positive if every output lies on the correct side of ``vdd / 2``.
+    """
+    sign = 2 * np.asarray(ref) - 1
+    return ((v_out - vdd / 2) * sign).min(axis=-1) / (vdd / 2)
+
+
+def rank_full_adders(variants, vdd: float = 5.0, model: TFTModel = TFTModel()):
+    """Rank `full_adder` variants by their simulated logic margin.
+
+    Args:
+        variants: Sequence of (l_gate, l_overlap, w_mesa, r_type) tuples.
+        vdd: Supply voltage.
+        model: TFT compact model.
+
+    Returns:
+        List of (variant, margin, mean supply power in W) tuples, best first.
+        Ties in margin are broken by lower power.
+    """
+    variants = list(variants)
+    l_gate, l_overlap, w_mesa, r_type = zip(*variants)
+    res = simulate_full_adder(l_gate, l_overlap, w_mesa, r_type, vdd, model=model)
+
+    margin = np.minimum(
+        noise_margin(res["s"], res["s_ref"], vdd),
+        noise_margin(res["cout"], res["cout_ref"], vdd),
+    )
+    power = res["i_dd"].mean(axis=1) * vdd
+
+    order = np.lexsort((power, -margin))
+    return [(variants[i], margin[i], power[i]) for i in order]
+
+
+if __name__ == "__main__":
+    variants = list(
+        itertools.product(
+            [5, 10, 20, 40],  # l_g
+            [2, 5, 10, 20],  # l_ov
+            [10, 20, 50, 100],  # w
+            [("W", 500), ("W", 5000), ("ITO", 0.05), ("ITO", 0.1), ("ITO", 0.2)],
+        )
+    )
+
+    for variant, margin, power in rank_full_adders(variants)[:20]:
+        print(f"{variant}: margin {margin:+.3f}, power {power * 1e6:.2f} uW")
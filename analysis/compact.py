@@ -0,0 +1,341 @@
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from analysis import transfer
+from analysis.catalog import Catalog
+from analysis.circuit import TFTModel, channel_current, overdrive
+from analysis.measurement import CACHE_DIR, _atomic_write, load
+from analysis.transfer import _step_column, pad
+
+FITS_PATH = Path(".cache/compact_fits.json")
+
+# Bump to invalidate the cached fits when the model or the fit changes
+FIT_VERSION = 2
+
+# Fitted parameters, in the order of the fit vector, and their bounds. Positive
+# parameters are fitted on a log scale.
+PARAMETERS = ("v_th", "mobility", "gamma", "r_c", "ss")
+LOG_PARAMETERS = ("mobility", "r_c", "ss")
+BOUNDS = {
+    "v_th": (-10.0, 10.0),
+    "mobility": (1e-4, 1e3),  # cm^2/Vs
+    "gamma": (0.0, 2.0),
+    "r_c": (1e-3, 1e7),  # Ohm cm
+    "ss": (0.06, 5.0),  # V/dec
+}
+
+# Weight of the residual (in decades per unit of the fit parameter) that pulls
+# a parameter towards its start value. Contact-limited devices do not pin the
+# channel mobility, which would otherwise run into its bound.
+PRIOR = {"mobility": 0.3, "gamma": 0.3}
+
+# Currents below the gate leakage of the devices carry no information
+I_FLOOR = 1e-9
+_LOG = np.array([name in LOG_PARAMETERS for name in PARAMETERS])
+_PRIOR = np.array([PRIOR.get(name, 0.0) for name in PARAMETERS])
+_LOWER, _UPPER = np.array(
+    [
+        np.log(BOUNDS[name]) if name in LOG_PARAMETERS else BOUNDS[name]
+        for name in PARAMETERS
+    ]
+).T
+
+
+def stack_devices(records, cache_dir=CACHE_DIR) -> dict:
+    """Stack the TRANSFER and OUTPUT curves of every TFT into one row per file.
+
+    Only records with a known channel (``w_mesa`` and ``l_gate``) are used.
+    All steps of both setups are concatenated, with the voltages taken relative
+    to the source. Setups without a sweep, a step or a source ``S`` are
+    skipped, and so are records without any other setup.
+
+    Returns:
+        Mapping with ``vg``, ``vd`` and ``i_d`` of shape (n, n_points), NaN
+        padded, and per row the source ``path``, its ``record`` index into
+        ``records``, the channel ``w`` and ``l`` in um and the figures of merit
+        ``v_th``, ``mobility`` and ``ss`` of `transfer.extract` (NaN without a
+        transfer curve), which start the fit.
+    """
+    path, index, vg, vd, i_d, w, l = [], [], [], [], [], [], []
+    for i, record in enumerate(records):
+        setups = [s for s in ("TRANSFER", "OUTPUT") if s in record.setups]
+        if not setups or record.w_mesa is None or record.l_gate is None:
+            continue
+        blocks = load(record.path, cache_dir)
+        g, d, i_ = [], [], []
+        for setup in setups:
+            block = blocks[setup]
+            sweep = next((s for s in block.sources.values() if s.mode == "SWEEP"), None)
+            step = next((s for s in block.sources.values() if s.mode == "STEP"), None)
+            # The biasing is only known with a swept and a stepped terminal and
+            # a source
+            if sweep is None or step is None or "S" not in block.sources:
+                continue
+            v_s = block.sources["S"].value or 0.0
+            x = block[f"V{sweep.id}"] - v_s
+            for k, v in enumerate(step.values):
+                y = block[_step_column("ID", k)]
+                g.append(x if sweep.id == "G" else np.full(len(x), v - v_s))
+                d.append(x if sweep.id == "D" else np.full(len(x), v - v_s))
+                i_.append(y)
+        if not g:
+            continue
+        path.append(record.path)
+        index.append(i)
+        vg.append(np.concatenate(g))
+        vd.append(np.concatenate(d))
+        i_d.append(np.concatenate(i_))
+        w.append(record.w_mesa)
+        l.append(record.l_gate)
+
+    devices = {
+        "path": np.array(path, dtype=object),
+        "record": np.array(index, dtype=int),
+        "vg": pad(vg),
+        "vd": pad(vd),
+        "i_d": pad(i_d),
+        "w": np.array(w, dtype=float),
+        "l": np.array(l, dtype=float),
+    }
+
+    # Figures of merit of the lowest drain voltage transfer curve
+    curves = transfer.stack_transfer([records[i] for i in index], cache_dir)
+    params = transfer.extract(curves)
+    order = np.lexsort((curves["vd"], curves["record"]))
+    measured, first = np.unique(curves["record"][order], return_index=True)
+    for name in ("v_th", "mobility", "ss"):
+        devices[name] = np.full(len(index), np.nan)
+        devices[name][measured] = params[name][order[first]]
+    return devices
+
+
+def drain_current(p: np.ndarray, vg, vd, w, l):
+    """Evaluate the `TFTModel` drain current and its parameter Jacobian.
+
+    Args:
+        p: Fit vectors of shape (n, 5), see `PARAMETERS` and `LOG_PARAMETERS`.
+        vg: Gate-source voltages of shape (n, n_points).
+        vd: Drain-source voltages of shape (n, n_points).
+        w: Channel widths in um, shape (n,).
+        l: Channel lengths in um, shape (n,).
+
+    Returns:
+        The drain currents of shape (n, n_points) and their derivatives with
+        respect to ``p`` of shape (n, n_points, 5).
+    """
+    values = np.where(_LOG, np.exp(p), p).T[:, :, None]
+    tft = TFTModel(**dict(zip(PARAMETERS, values)))
+    beta = tft.beta(w[:, None], l[:, None])
+    theta = tft.theta(l[:, None])
+
+    f_s, df_s, dss_s = overdrive(vg - tft.v_th, tft.ss)
+    f_d, df_d, dss_d = overdrive(vg - vd - tft.v_th, tft.ss)
+    i, di_s, di_d, di_m, di_theta = channel_current(
+        f_s, f_d, 2 + tft.gamma, beta, theta
+    )
+
+    # beta and theta are both proportional to the mobility
+    jac = np.stack(
+        [
+            -di_s * df_s - di_d * df_d,
+            i + theta * di_theta,
+            di_m,
+            theta * di_theta,
+            tft.ss * (di_s * dss_s + di_d * dss_d),
+        ],
+        axis=-1,
+    )
+    return i, jac
+
+
+def residuals(p: np.ndarray, devices: dict, i_floor: float = I_FLOOR):
+    """Return the fit residuals in decades and their Jacobian.
+
+    The residual of a point is ``log10(i_floor + |I_model|)`` minus the same of
+    the measured current, so the fit weighs the subthreshold region and the on
+    current alike. Padding gives zero residuals.
+    """
+    i, jac = drain_current(p, devices["vg"], devices["vd"], devices["w"], devices["l"])
+    measured = devices["i_d"]
+    valid = np.isfinite(measured) & np.isfinite(devices["vg"])
+    with np.errstate(invalid="ignore"):
+        r = np.log10(i_floor + np.abs(i)) - np.log10(i_floor + np.abs(measured))
+    scale = np.sign(i) / ((i_floor + np.abs(i)) * np.log(10))
+    r = np.where(valid, r, 0)
+    jac = np.where(valid[..., None], jac * scale[..., None], 0)
+    return r, jac
+
+
+def solve(
+    devices: dict, p0: np.ndarray, i_floor: float = I_FLOOR, **kwargs
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit every device with the bounded `scipy.optimize.least_squares`.
+
+    Uses the analytic Jacobian of `residuals`. The `PRIOR` residuals keep
+    poorly determined parameters near their start ``p0``.
+
+    Args:
+        devices: Stacked devices, see `stack_devices`.
+        p0: Start vectors of shape (n, 5).
+        i_floor: Current floor of the residuals in A.
+        kwargs: Passed to `scipy.optimize.least_squares`.
+
+    Returns:
+        The fit vectors of shape (n, 5) and the RMS residual in decades.
+    """
+    p0 = np.clip(p0, _LOWER, _UPPER)
+    prior = np.diag(_PRIOR)
+    p = np.empty_like(p0)
+    for k in range(len(p0)):
+        device = _take(devices, [k])
+
+        def fun(x):
+            r = residuals(x[None], device, i_floor)[0][0]
+            return np.concatenate([r, _PRIOR * (x - p0[k])])
+
+        def jac(x):
+            return np.concatenate([residuals(x[None], device, i_floor)[1][0], prior])
+
+        p[k] = least_squares(
+            fun, p0[k], jac, bounds=(_LOWER, _UPPER), x_scale="jac", **kwargs
+        ).x
+
+    r = residuals(p, devices, i_floor)[0]
+    n = np.maximum(np.isfinite(devices["i_d"]).sum(axis=1), 1)
+    return p, np.sqrt((r**2).sum(axis=1) / n)
+
+
+def _initial(devices: dict) -> np.ndarray:
+    """Return the start vectors from the transfer figures of merit."""
+    default = TFTModel()
+    p0 = np.empty((len(devices["w"]), len(PARAMETERS)))
+    for k, name in enumerate(PARAMETERS):
+        lower, upper = BOUNDS[name]
+        values = devices.get(name, np.full(len(p0), np.nan))
+        start = getattr(default, name) if name != "r_c" else 1.0
+        values = np.where(np.isfinite(values), np.clip(values, lower, upper), start)
+        p0[:, k] = np.log(values) if name in LOG_PARAMETERS else values
+    return p0
+
+
+def fit_devices(devices: dict, i_floor: float = I_FLOOR, **kwargs) -> dict:
+    """Fit the compact model to stacked devices (see `stack_devices`).
+
+    Returns:
+        Mapping with the fitted `PARAMETERS` and the ``rms`` residual in
+        decades, one value per device.
+    """
+    p, rms = solve(devices, _initial(devices), i_floor, **kwargs)
+    fits = {name: p[:, k] for k, name in enumerate(PARAMETERS)}
+    for name in LOG_PARAMETERS:
+        fits[name] = np.exp(fits[name])
+    fits["rms"] = rms
+    return fits
+
+
+def _take(devices: dict, rows) -> dict:
+    return {key: value[rows] for key, value in devices.items()}
+
+
+def data_hash(devices: dict, i: int, i_floor: float) -> str:
+    """Hash everything the fit of device ``i`` depends on."""
+    sha1 = hashlib.sha1(f"{FIT_VERSION} {i_floor!r}".encode())
+    for key in ("vg", "vd", "i_d", "w", "l", "v_th", "mobility", "ss"):
+        sha1.update(np.ascontiguousarray(devices[key][i], dtype=float).tobytes())
+    return sha1.hexdigest()
+
+
+def fit_cached(
+    devices: dict,
+    path=FITS_PATH,
+    workers: int | None = None,
+    chunk_size: int = 64,
+    i_floor: float = I_FLOOR,
+) -> dict:
+    """Fit the devices, reusing cached fits of unchanged data.
+
+    Devices whose data hash is not cached yet are split into chunks of
+    ``chunk_size``, which are fitted in a process pool. A single chunk is
+    fitted in-process.
+
+    Returns:
+        Mapping of per-device arrays as returned by `fit_devices`.
+    """
+    path = Path(path)
+    cache = json.loads(path.read_text()) if path.exists() else {}
+    keys = [data_hash(devices, i, i_floor) for i in range(len(devices["w"]))]
+    new = np.array([i for i, key in enumerate(keys) if key not in cache], int)
+
+    if len(new):
+        chunks = [
+            _take(devices, new[k : k + chunk_size])
+            for k in range(0, len(new), chunk_size)
+        ]
+        if len(chunks) == 1:
+            results = [fit_devices(chunks[0], i_floor)]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(fit_devices, chunks, [i_floor] * len(chunks)))
+        rows = iter(new)
+        for result in results:
+            for k in range(len(result["rms"])):
+                cache[keys[next(rows)]] = {
+                    name: float(values[k]) for name, values in result.items()
+                }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, lambda f: f.write(json.dumps(cache).encode()))
+
+    names = PARAMETERS + ("rms",)
+    return {name: np.array([cache[key][name] for key in keys]) for name in names}
+
+
+def model(fits: dict, i: int) -> TFTModel:
+    """Return the fitted `TFTModel` of device ``i``."""
+    return TFTModel(**{name: float(fits[name][i]) for name in PARAMETERS})
+
+
+def median_model(fits: dict, rows=None, max_rms: float = 0.5) -> TFTModel:
+    """Return a `TFTModel` with the median parameters of the good fits.
+
+    Only fits of the selected ``rows`` with an RMS residual below ``max_rms``
+    decades count. Falls back to the default model without any.
+    """
+    good = fits["rms"] < max_rms
+    if rows is not None:
+        good &= np.isin(np.arange(len(good)), rows)
+    if not good.any():
+        return TFTModel()
+    return TFTModel(**{name: float(np.median(fits[name][good])) for name in PARAMETERS})
+
+
+def fit_all(catalog: Catalog | None = None, cache_dir=CACHE_DIR, **kwargs):
+    """Fit the compact model to every TFT in the catalog.
+
+    Returns:
+        The stacked devices and their fits, see `stack_devices` and
+        `fit_cached`.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    devices = stack_devices(catalog, cache_dir)
+    return devices, fit_cached(devices, **kwargs)
+
+
+if __name__ == "__main__":
+    devices, fits = fit_all()
+
+    for i, path in enumerate(devices["path"]):
+        print(
+            f"{path.rsplit('/', 1)[-1]:45s} "
+            f"Vth {fits['v_th'][i]:+5.2f} V  "
+            f"mu {fits['mobility'][i]:6.2f} cm2/Vs  "
+            f"gamma {fits['gamma'][i]:4.2f}  "
+            f"Rc {fits['r_c'][i]:8.2e} Ohm cm  "
+            f"SS {fits['ss'][i] * 1e3:5.0f} mV/dec  "
+            f"rms {fits['rms'][i]:5.3f} dec"
+        )
+    print(median_model(fits))
@@ -0,0 +1,240 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from analysis import inverter, transfer
+from analysis.catalog import Catalog, make_record
+from analysis.measurement import CACHE_DIR, DATA_DIR, _atomic_write
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # fall back to polling
+    FileSystemEventHandler, Observer = object, None
+
+SUMMARY_PATH = Path(".cache/summary.json")
+
+
+def ingest_file(path, cache_dir=CACHE_DIR) -> tuple:
+    """Parse one file and compute its derived metrics.
+
+    Runs in a worker process. Parsing also fills the measurement cache, so the
+    main process only reads the memory-mapped result.
+
+    Returns:
+        The catalog record and a mapping of metric name to per-curve arrays.
+    """
+    record = make_record(path, cache_dir)
+    metrics = {}
+    if "TRANSFER" in record.setups and record.w_mesa is not None:
+        curves = transfer.stack_transfer([record], cache_dir)
+        metrics["transfer"] = dict(vd=curves["vd"], **transfer.extract(curves))
+    if "NOT" in record.setups and record.structure == "inverter":
+        vtc = inverter.stack_vtc([record], cache_dir)
+        metrics["inverter"] = dict(vdd=vtc["vdd"], **inverter.extract(vtc))
+    return record, metrics
+
+
+class _Wake(FileSystemEventHandler):
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def on_any_event(self, event):
+        if str(event.src_path).endswith(".dat"):
+            self.event.set()
+
+
+class Ingest:
+    """Incrementally maintained catalog and metrics of a data directory.
+
+    Every `update` stats the ``.dat`` files below ``root`` and only sends new
+    or changed files to the worker pool. Files modified less than ``settle``
+    seconds ago are left for the next update, since the probe station may
+    still be writing them.
+
+    Example:
+        >>> with Ingest() as ingest:
+        ...     ingest.watch()
+    """
+
+    def __init__(
+        self,
+        root=DATA_DIR,
+        cache_dir=CACHE_DIR,
+        workers: int | None = None,
+        settle: float = 0.2,
+        summary_path=SUMMARY_PATH,
+    ):
+        self.root = Path(root)
+        self.cache_dir = cache_dir
+        self.settle = settle
+        self.summary_path = summary_path
+        self.pool = ProcessPoolExecutor(workers)
+
+        self.stats = {}
+        self.settling = False
+        self.records = {}
+        self.metrics = {}
+        self.catalog = Catalog()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def _changed(self) -> tuple[dict[Path, tuple], list[Path]]:
+        now = time.time()
+        seen = set()
+        changed = {}
+        for path in self.root.rglob("*.dat"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # deleted since listed
+                continue
+            seen.add(path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if self.stats.get(path) == key:
+                continue
+            if now - stat.st_mtime >= self.settle:
+                changed[path] = key
+            else:
+                self.settling = True
+        removed = [p for p in self.stats if p not in seen]
+        return dict(sorted(changed.items())), removed
+
+    def _remove(self, path: Path):
+        self.stats.pop(path, None)
+        self.records.pop(path, None)
+        self.metrics.pop(path, None)
+
+    def update(self) -> list[Path]:
+        """Ingest new and changed files.
+
+        Every file is stored with the modification time and size it had when
+        it was found, so a file rewritten while being parsed is ingested again
+        by the next update. A file deleted while being parsed counts as
+        removed.
+
+        Returns:
+            The paths that were (re)ingested or removed.
+        """
+        self.settling = False
+        changed, removed = self._changed()
+        for path in removed:
+            self._remove(path)
+
+        futures = {
+            path: self.pool.submit(ingest_file, path, self.cache_dir)
+            for path in changed
+        }
+        for path, future in futures.items():
+            try:
+                self.records[path], self.metrics[path] = future.result()
+            except FileNotFoundError:
+                self._remove(path)
+                removed.append(path)
+                continue
+            except Exception as e:
+                # Retried once the file changes again
+                print(f"Failed to ingest {path}: {e!r}")
+                self.records.pop(path, None)
+                self.metrics.pop(path, None)
+            self.stats[path] = changed[path]
+
+        changed = [path for path in changed if path in self.stats]
+        if changed or removed:
+            self.catalog = Catalog(self.records[p] for p in sorted(self.records))
+            if self.summary_path is not None:
+                summary = json.dumps(self.summary(), indent=2).encode()
+                Path(self.summary_path).parent.mkdir(parents=True, exist_ok=True)
+                _atomic_write(Path(self.summary_path), lambda f: f.write(summary))
+        return changed + removed
+
+    def summary(self) -> dict:
+        """Return per-structure counts and median metrics of the latest files."""
+        summary = {}
+        for structure in sorted({str(r.structure) for r in self.catalog}):
+            latest = self.catalog.query(latest=True, structure=structure)
+            entry = {
+                "files": len(self.catalog.rows(structure=structure)),
+                "devices": len(latest),
+            }
+
+            for name, fields in (
+                ("transfer", ("v_th", "ss", "mobility", "on_off")),
+                ("inverter", ("max_gain", "v_m", "nm_h", "nm_l")),
+            ):
+                rows = [self.metrics[Path(r.path)].get(name) for r in latest]
+                rows = [m for m in rows if m is not None]
+                if rows:
+                    for field in fields:
+                        values = np.concatenate([m[field] for m in rows])
+                        values = values[np.isfinite(values)]
+                        if len(values):
+                            entry[f"{name}_{field}"] = float(np.median(values))
+            summary[structure] = entry
+        return summary
+
+    def watch(self, interval: float = 0.5, callback=None):
+        """Keep the catalog up to date until interrupted.
+
+        Uses a filesystem observer if watchdog is installed, so updates start
+        as soon as a file arrives. Polling every ``interval`` seconds remains
+        as fallback, files that were still settling are retried after
+        ``settle`` seconds.
+
+        Args:
+            interval: Polling interval in seconds.
+            callback: Called with the list of updated paths after every update
+                that changed something.
+        """
+        wake = threading.Event()
+        observer = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_Wake(wake), str(self.root), recursive=True)
+            observer.start()
+
+        try:
+            while True:
+                updated = self.update()
+                if updated and callback is not None:
+                    callback(updated)
+                wake.wait(self.settle if self.settling else interval)
+                wake.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--once", action="store_true", help="ingest once and exit")
+    args = parser.parse_args()
+
+    def report(updated):
+        print(f"Updated {len(updated)} file(s)")
+        for structure, entry in ingest.summary().items():
+            print(f"  {structure:16s} {entry}")
+
+    with Ingest(args.root, workers=args.workers) as ingest:
+        start = time.perf_counter()
+        report(ingest.update())
+        print(f"Initial ingest took {time.perf_counter() - start:.2f} s")
+        if not args.once:
+            ingest.watch(args.interval, report)
@@ -0,0 +1,240 @@
+from collections import defaultdict
+
+import numpy as np
+
+from analysis.catalog import Catalog
+from analysis.measurement import CACHE_DIR, load
+from analysis.transfer import _step_column
+
+METRICS = ("max_gain", "v_m", "nm_h", "nm_l")
+
+
+def stack_vtc(records, cache_dir=CACHE_DIR, grid=None, n_grid: int = 501) -> dict:
+    """Resample the voltage transfer curves of ``records`` onto a common grid.
+
+    Every supply voltage step of a NOT measurement becomes one row. Curves are
+    NaN outside of their measured input range.
+
+    Args:
+        records: Catalog records. Records without a NOT setup are skipped.
+        cache_dir: Measurement cache directory.
+        grid: Input voltages to resample onto. Defaults to ``n_grid`` points
+            spanning the input range of all curves.
+        n_grid: Number of grid points if ``grid`` is not given.
+
+    Returns:
+        Mapping with the input ``grid`` of shape (n_grid,), the output ``v_out``
+        of shape (n, n_grid) and per row the ``record`` index into ``records``
+        and the measured supply voltage ``vdd``.
+    """
+    index, vdd, v_in, v_out = [], [], [], []
+    for i, record in enumerate(records):
+        if "NOT" not in record.setups:
+            continue
+        block = load(record.path, cache_dir)["NOT"]
+        sweep = next(s for s in block.sources.values() if s.mode == "SWEEP")
+        step = next(s for s in block.sources.values() if s.mode == "STEP")
+        order = np.argsort(block[f"V{sweep.id}"])
+        for k, v in enumerate(step.values):
+            # Not every setup records the supply voltage
+            column = _step_column(f"V{step.id}", k)
+            index.append(i)
+            vdd.append(np.nanmedian(block[column]) if column in block.columns else v)
+            v_in.append(block[f"V{sweep.id}"][order])
+            v_out.append(block[_step_column("VOUT", k)][order])
+
+    if grid is None:
+        lo = min((x[0] for x in v_in), default=0)
+        hi = max((x[-1] for x in v_in), default=0)
+        grid = np.linspace(lo, hi, n_grid)
+    grid = np.asarray(grid, dtype=float)
+
+    out = np.full((len(v_in), len(grid)), np.nan)
+    for i, (x, y) in enumerate(zip(v_in, v_out)):
+        out[i] = np.interp(grid, x, y, left=np.nan, right=np.nan)
+
+    return {
+        "grid": grid,
+        "v_out": out,
+        "record": np.array(index, dtype=int),
+        "vdd": np.array(vdd, dtype=float),
+    }
+
+
+def extract(vtc: dict) -> dict:
+    """Compute the static inverter metrics of all resampled curves at once.
+
+    The noise margins use the unity-gain points that bound the transition
+    region: the contiguous run of ``gain >= 1`` around the switching point, so
+    isolated noise spikes elsewhere on the curve do not move them. V_M is the
+    first falling crossing of ``v_out = v_in``.
+
+    Returns:
+        Mapping of per-curve arrays: ``max_gain``, switching threshold ``v_m``
+        and noise margins ``nm_h`` and ``nm_l`` in V. Metrics that do not exist
+        for a curve (e.g. no gain above one) are NaN.
+    """
+    grid, v_out = vtc["grid"], vtc["v_out"]
+    rows = np.arange(len(v_out))
+    dx = np.diff(grid)
+
+    gain = -np.diff(v_out, axis=1) / dx
+    max_gain = np.where(np.isnan(gain), -np.inf, gain).max(axis=1, initial=-np.inf)
+
+    # Switching threshold: interpolate the first sign change of v_out - v_in
+    d = v_out - grid
+    cross = (d[:, :-1] >= 0) & (d[:, 1:] < 0)
+    k = np.argmax(cross, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = d[rows, k] / (d[rows, k] - d[rows, k + 1])
+    v_m = np.where(cross.any(axis=1), grid[k] + frac * dx[k], np.nan)
+
+    # Unity-gain points bound the transition region around the switching point,
+    # or around the maximum gain if V_M has gain below one or does not exist
+    unity = gain >= 1
+    steepest = np.argmax(np.where(np.isnan(gain), -np.inf, gain), axis=1)
+    center = np.where(cross.any(axis=1), k, steepest)
+    center = np.where(unity[rows, center], center, steepest)
+    has = unity[rows, center]
+    columns = np.arange(unity.shape[1])
+    first = np.where(~unity & (columns < center[:, None]), columns, -1).max(axis=1) + 1
+    last = np.where(~unity & (columns > center[:, None]), columns, unity.shape[1])
+    last = last.min(axis=1) - 1
+    mid_in = (grid[1:] + grid[:-1]) / 2
+    mid_out = (v_out[:, 1:] + v_out[:, :-1]) / 2
+    v_il, v_oh = mid_in[first], mid_out[rows, first]
+    v_ih, v_ol = mid_in[last], mid_out[rows, last]
+
+    return {
+        "max_gain": np.where(np.isfinite(max_gain), max_gain, np.nan),
+        "v_m": v_m,
+        "nm_h": np.where(has, v_oh - v_ih, np.nan),
+        "nm_l": np.where(has, v_il - v_ol, np.nan),
+    }
+
+
+def best_remeasure(records, vtc: dict, metrics: dict) -> np.ndarray:
+    """Return the index of the best record of every device.
+
+    A record is scored by its best noise margin, min(NM_H, NM_L) / VDD, over
+    all supply steps. Ties go to the higher maximum gain.
+    """
+    score = np.fmin(metrics["nm_h"], metrics["nm_l"]) / vtc["vdd"]
+    score = np.where(np.isnan(score), -np.inf, score)
+    gain = np.where(np.isnan(metrics["max_gain"]), -np.inf, metrics["max_gain"])
+
+    n = len(records)
+    record_score = np.full(n, -np.inf)
+    record_gain = np.full(n, -np.inf)
+    np.maximum.at(record_score, vtc["record"], score)
+    np.maximum.at(record_gain, vtc["record"], gain)
+
+    measured = np.zeros(n, bool)
+    measured[vtc["record"]] = True
+    devices = defaultdict(list)
+    for i in np.flatnonzero(measured):
+        devices[records[i].device].append(i)
+
+    best = []
+    for rows in devices.values():
+        rows = np.array(rows)
+        best.append(rows[np.lexsort((record_gain[rows], record_score[rows]))[-1]])
+    return np.sort(best)
+
+
+def anneal_label(record) -> str:
+    """Return the anneal condition of a record, e.g. ``250c_n2``.
+
+    Files without an anneal in their name are ``unannealed``, a temperature
+    without a known atmosphere gives e.g. ``250c``.
+    """
+    if record.anneal is None and record.anneal_temp is None:
+        return "unannealed"
+    if record.anneal_temp is None:
+        return record.anneal
+    return "_".join(
+        x for x in (f"{record.anneal_temp:g}c", record.anneal) if x is not None
+    )
+
+
+def group_key(record, vdd) -> tuple:
+    """Return the (wafer, anneal, l_gate, l_overlap, w_mesa, vdd) group of a curve.
+
+    See `anneal_label` for the anneal condition.
+    """
+    return (
+        record.wafer,
+        anneal_label(record),
+        record.l_gate,
+        record.l_overlap,
+        record.w_mesa,
+        round(vdd, 1),
+    )
+
+
+def summarize(records, vtc: dict, metrics: dict, rows=None) -> dict:
+    """Average the metrics per wafer, anneal condition, layout and supply voltage.
+
+    Args:
+        records: Records the curves were stacked from.
+        vtc: Resampled curves as returned by `stack_vtc`.
+        metrics: Metrics as returned by `extract`.
+        rows: Record indices to include, e.g. from `best_remeasure`. Defaults
+            to all records.
+
+    Returns:
+        Mapping with the ``group`` keys (see `group_key`), the number of curves
+        ``n`` per group and the NaN-ignoring mean of every metric.
+    """
+    curves = np.arange(len(vtc["record"]))
+    if rows is not None:
+        curves = curves[np.isin(vtc["record"], rows)]
+
+    keys = [group_key(records[vtc["record"][i]], vtc["vdd"][i]) for i in curves]
+    group = sorted(set(keys), key=str)
+    lookup = {key: i for i, key in enumerate(group)}
+    inverse = np.array([lookup[key] for key in keys], dtype=int)
+
+    summary = {"group": np.empty(len(group), dtype=object)}
+    summary["group"][:] = group
+    summary["n"] = np.bincount(inverse, minlength=len(group))
+    for name in METRICS:
+        x = metrics[name][curves]
+        valid = ~np.isnan(x)
+        total = np.bincount(inverse, np.where(valid, x, 0), minlength=len(group))
+        count = np.bincount(inverse, valid, minlength=len(group))
+        with np.errstate(invalid="ignore"):
+            summary[name] = total / count
+    return summary
+
+
+def extract_all(catalog: Catalog | None = None, cache_dir=CACHE_DIR, **kwargs):
+    """Analyze every inverter measurement in the catalog.
+
+    Returns:
+        The inverter records, their resampled curves, the per-curve metrics and
+        the indices of the best record per device.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    records = catalog.query(structure="inverter")
+    vtc = stack_vtc(records, cache_dir, **kwargs)
+    metrics = extract(vtc)
+    return records, vtc, metrics, best_remeasure(records, vtc, metrics)
+
+
+if __name__ == "__main__":
+    records, vtc, metrics, best = extract_all()
+
+    print("Best measurement per device:")
+    for i in best:
+        print(f"  {records[i].path.rsplit('/', 1)[-1]}")
+
+    summary = summarize(records, vtc, metrics, best)
+    for i, group in enumerate(summary["group"]):
+        wafer, anneal, l_gate, l_overlap, w_mesa, vdd = group
+        print(
+            f"wafer{wafer} {anneal:10s} {l_gate:3g}/{l_overlap:3g}/{w_mesa:4g} VDD {vdd:4.1f}  "
+            f"gain {summary['max_gain'][i]:5.2f}  V_M {summary['v_m'][i]:5.2f}  "
+            f"NM_H {summary['nm_h'][i]:5.2f}  NM_L {summary['nm_l'][i]:5.2f}  "
+            f"(n={summary['n'][i]})"
+        )
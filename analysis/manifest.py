@@ -0,0 +1,307 @@
+import csv
+import math
+from pathlib import Path
+
+import klayout.db as kdb
+import numpy as np
+from kfactory.conf import PROPID
+from scipy.spatial import cKDTree
+
+from analysis.catalog import _CELLS
+
+MANIFEST_PATH = Path("full_adder_probes.csv")
+
+# Measured structure of every probed layout cell, see `analysis.catalog`
+STRUCTURES = {cell: structure for structure, cell in _CELLS.items()}
+STRUCTURES["resistor_w_test", None] = "resistor_w"
+DEVICE_CELLS = {cell for cell, _ in STRUCTURES}
+
+KEYS = ("l_gate", "l_overlap", "w_mesa", "length", "n_transistors")
+FIELDS = ("order", "die", "structure", "cell") + KEYS + ("settings", "pad", "x", "y")
+
+
+def _pads(layout: kdb.Layout, cell: kdb.Cell) -> dict:
+    """Return the center in dbu of every named (pad) instance of ``cell``."""
+    pads = {}
+    for inst in cell.each_inst():
+        name = inst.property(PROPID.NAME)
+        if name is not None:
+            center = inst.bbox().center()
+            pads[str(name)] = (center.x, center.y)
+    return dict(sorted(pads.items()))
+
+
+def devices(c, region=None) -> list[dict]:
+    """Find every placed probe device below ``c``.
+
+    The placed hierarchy, including array references, is walked with KLayout's
+    instance iterator, which uses the layout's spatial index, so restricting
+    the search to a ``region`` only visits the cells overlapping it.
+
+    Args:
+        c: Top component, e.g. the mask of `main`.
+        region: Optional `kdb.DBox` in um to search in.
+
+    Returns:
+        Per device the layout ``cell`` name, its ``settings``, its
+        ``structure`` and the ``pads`` mapping of pad name to (x, y) in um.
+    """
+    kcl = c.kcl
+    layout = kcl.layout
+    targets = [
+        ci for ci in range(layout.cells()) if kcl[ci].function_name in DEVICE_CELLS
+    ]
+    if region is None:
+        it = kdb.RecursiveInstanceIterator(layout, c.kdb_cell)
+    else:
+        box = region.to_itype(layout.dbu)
+        it = kdb.RecursiveInstanceIterator(layout, c.kdb_cell, box)
+    it.targets = targets
+    it.unselect_cells(targets)
+
+    cells = {}
+    found = []
+    while not it.at_end():
+        ci = it.inst_cell().cell_index()
+        if ci not in cells:
+            kcell = kcl[ci]
+            settings = kcell.settings.model_dump()
+            structure = STRUCTURES[kcell.function_name, settings.get("n_transistors")]
+            pads = _pads(layout, it.inst_cell())
+            cells[ci] = (kcell.function_name, settings, structure, pads)
+        cell, settings, structure, pads = cells[ci]
+        if pads:  # invalid full adders are replaced by a boundary box
+            trans = it.trans() * it.inst_trans()
+            dbu = layout.dbu
+            found.append(
+                dict(
+                    cell=cell,
+                    settings=settings,
+                    structure=structure,
+                    pads={
+                        name: (trans * kdb.Point(*p)).to_dtype(dbu)
+                        for name, p in pads.items()
+                    },
+                )
+            )
+        it.next()
+    return found
+
+
+def travel(points: np.ndarray, order=None) -> float:
+    """Return the stage travel in um to visit ``points`` in ``order``."""
+    points = points if order is None else points[order]
+    return float(np.linalg.norm(np.diff(points, axis=0), axis=1).sum())
+
+
+def _nearest_neighbor(points: np.ndarray, tree: cKDTree, start: int) -> np.ndarray:
+    """Return the nearest neighbor tour through ``points`` from ``start``."""
+    n = len(points)
+    order = np.empty(n, dtype=int)
+    left = np.ones(n, bool)
+    current = start
+    k = 8
+    for step in range(n):
+        order[step] = current
+        left[current] = False
+        if step == n - 1:
+            break
+        # Query ever more neighbors until one is left. Only near the end of
+        # the tour, when few points are left, does this reach far.
+        while True:
+            _, near = tree.query(points[current], k=min(k, n))
+            near = near[left[near]]
+            if len(near):
+                current = near[0]
+                k = 8
+                break
+            if k >= n:
+                raise AssertionError("no point left")
+            k *= 4
+    return order
+
+
+def _two_opt(
+    points: np.ndarray,
+    order: np.ndarray,
+    near: np.ndarray,
+    max_passes: int,
+    max_segment: int,
+):
+    """Improve the open tour ``order`` in place with 2-opt moves.
+
+    Only moves that connect a point to one of its ``near`` neighbors are
+    tried and reversed segments are at most ``max_segment`` long, so a pass
+    costs O(n k max_segment) at worst and about O(n k) in practice. Reversing
+    ``order[lo + 1 : hi + 1]`` replaces the edges (lo, lo + 1) and (hi, hi + 1)
+    by (lo, hi) and (lo + 1, hi + 1); at the ends of the tour one edge is
+    replaced.
+    """
+    n = len(order)
+    xy = points.tolist()
+    near = near.tolist()
+    position = np.empty(n, dtype=int)
+    position[order] = np.arange(n)
+    position = position.tolist()
+    tour = order.tolist()
+
+    def dist(a, b):
+        return math.dist(xy[a], xy[b])
+
+    def reverse(lo, hi):
+        tour[lo:hi] = tour[lo:hi][::-1]
+        for k in range(lo, hi):
+            position[tour[k]] = k
+
+    for _ in range(max_passes):
+        improved = False
+        for a in range(n):
+            for direction in (1, -1):
+                i = position[a]
+                if not 0 <= i + direction < n:
+                    continue
+                b = tour[i + direction]
+                d_ab = dist(a, b)
+                for c in near[a]:
+                    d_ac = dist(a, c)
+                    if d_ac >= d_ab:
+                        break
+                    j = position[c]
+                    if j + direction == i:
+                        continue
+                    if 0 <= j + direction < n:
+                        d = tour[j + direction]
+                        gain = d_ab + dist(c, d) - d_ac - dist(b, d)
+                    else:  # c is at the end of the tour
+                        gain = d_ab - d_ac
+                    lo, hi = min(i, j), max(i, j)
+                    if gain <= 1e-6 or hi - lo > max_segment:
+                        continue
+                    if direction == 1:
+                        reverse(lo + 1, hi + 1)
+                    else:
+                        reverse(lo, hi)
+                    improved = True
+                    break
+        if not improved:
+            break
+    order[:] = tour
+
+
+def probe_order(
+    points: np.ndarray,
+    start: int | None = None,
+    k: int = 10,
+    max_passes: int = 20,
+    max_segment: int = 1000,
+) -> np.ndarray:
+    """Return a short open tour through ``points``.
+
+    Builds a nearest neighbor tour and improves it with 2-opt moves until no
+    move shortens it. Both only look at the ``k`` nearest neighbors of every
+    point, found with a k-d tree, so the cost grows about linearly with the
+    number of points.
+
+    Args:
+        points: Array of shape (n, 2).
+        start: Index of the first point. Defaults to the lower left point.
+        k: Number of neighbors tried per point in the 2-opt moves.
+        max_passes: Maximum number of 2-opt passes over the tour.
+        max_segment: Maximum number of points a 2-opt move reverses.
+
+    Returns:
+        The visiting order, indices into ``points``.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    if start is None:
+        start = int(np.argmin(points.sum(axis=1)))
+
+    tree = cKDTree(points)
+    order = _nearest_neighbor(points, tree, start)
+    _, near = tree.query(points, k=min(k + 1, n))
+    _two_opt(points, order, near[:, 1:], max_passes, max_segment)
+    return order
+
+
+def die_order(points: np.ndarray, dies: np.ndarray, **kwargs) -> np.ndarray:
+    """Return a short tour through ``points`` that finishes one die at a time.
+
+    The dies are visited in a tour through their centers. Within every die
+    the tour starts at the point nearest to the last point of the previous
+    die, see `probe_order`.
+
+    Args:
+        points: Array of shape (n, 2).
+        dies: Die label of every point.
+        kwargs: Passed to `probe_order`.
+
+    Returns:
+        The visiting order, indices into ``points``.
+    """
+    labels, inverse = np.unique(dies, return_inverse=True)
+    inverse = inverse.ravel()
+    centers = np.array([points[inverse == d].mean(axis=0) for d in range(len(labels))])
+
+    order = []
+    last = None
+    for d in probe_order(centers, **kwargs):
+        rows = np.flatnonzero(inverse == d)
+        start = None
+        if last is not None:
+            start = int(np.argmin(np.linalg.norm(points[rows] - last, axis=1)))
+        order.append(rows[probe_order(points[rows], start, **kwargs)])
+        last = points[order[-1][-1]]
+    return np.concatenate(order) if order else np.arange(0)
+
+
+def manifest(c, pitch=None, region=None) -> list[dict]:
+    """Return the probe manifest of ``c``: one row per pad, in probing order.
+
+    Args:
+        c: Top component.
+        pitch: Die stepping pitch in um, to label every device with its
+            ``R<row>C<column>`` die (see `pdk.stepping.step`). Every die is
+            probed completely before moving to the next.
+        region: Optional `kdb.DBox` to restrict the manifest to.
+    """
+    found = devices(c, region)
+    centers = np.array(
+        [np.mean([(p.x, p.y) for p in d["pads"].values()], axis=0) for d in found]
+    ).reshape(-1, 2)
+    dies = [""] * len(found)
+    if pitch is not None:
+        columns, rows = np.floor(centers / pitch).astype(int).T
+        dies = [f"R{row}C{column}" for row, column in zip(rows, columns)]
+    order = die_order(centers, np.array(dies))
+
+    rows = []
+    for rank, i in enumerate(order):
+        device = found[i]
+        settings = device["settings"]
+        other = {k: v for k, v in settings.items() if k not in KEYS}
+        for pad, p in device["pads"].items():
+            rows.append(
+                dict(
+                    order=rank,
+                    die=dies[i],
+                    structure=device["structure"],
+                    cell=device["cell"],
+                    **{key: settings.get(key, "") for key in KEYS},
+                    settings=" ".join(f"{k}={v}" for k, v in other.items()),
+                    pad=pad,
+                    x=round(p.x, 3),
+                    y=round(p.y, 3),
+                )
+            )
+    return rows
+
+
+def write_manifest(rows: list[dict], path=MANIFEST_PATH):
+    """Write the manifest ``rows`` as CSV."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
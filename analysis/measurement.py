@@ -0,0 +1,443 @@
+import dataclasses
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path("Data")
+CACHE_DIR = Path(".cache/measurements")
+CACHE_VERSION = 3
+
+# Significant digits up to which columns are cached as float32
+FLOAT32_DIGITS = 6
+
+
+@dataclass(frozen=True)
+class Source:
+    """One SMU entry of the CONDITIONS section of a measurement setup."""
+
+    id: str
+    unit: str
+    mode: str | None = None
+    start: float | None = None
+    stop: float | None = None
+    pnts: int | None = None
+    step: float | None = None
+    value: float | None = None
+
+    @property
+    def values(self) -> np.ndarray:
+        """Return the programmed sweep / step values of this source."""
+        if self.value is not None:
+            return np.array([self.value])
+        return np.linspace(self.start, self.stop, self.pnts)
+
+
+@dataclass
+class Block:
+    """One SETUP / DATA block of a measurement file, stored column-wise."""
+
+    setup: str
+    date: str
+    time: str
+    sources: dict[str, Source]
+    columns: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+
+@dataclass
+class Measurement:
+    """A parsed ``.dat`` export of the parameter analyzer."""
+
+    path: Path
+    attributes: list[str]
+    blocks: list[Block]
+
+    def __getitem__(self, setup: str) -> Block:
+        for block in self.blocks:
+            if block.setup == setup:
+                return block
+        raise KeyError(setup)
+
+    @property
+    def setups(self) -> list[str]:
+        return [block.setup for block in self.blocks]
+
+
+_SOURCE_FIELDS = {
+    "UNIT": ("unit", str),
+    "MODE": ("mode", str),
+    "START": ("start", float),
+    "STOP": ("stop", float),
+    "PNTS": ("pnts", int),
+    "STEP": ("step", float),
+    "VALUE": ("value", float),
+}
+
+
+def _parse_data(lines: list[str], n_columns: int) -> np.ndarray:
+    values = " ".join(lines).replace("*", "nan").split()
+    return np.array(values, dtype=float).reshape(-1, n_columns)
+
+
+def parse(path) -> tuple[Measurement, list[np.ndarray]]:
+    """Parse a ``.dat`` file.
+
+    Returns:
+        The measurement and, per block, the (n_rows, n_columns) data matrix
+        the block columns are views into.
+    """
+    path = Path(path)
+    lines = path.read_text().splitlines()
+
+    attributes = []
+    blocks = []
+    matrices = []
+    source = None
+    names = None
+    rows = []
+
+    def finish_data():
+        nonlocal names
+        if names is not None:
+            matrix = np.asfortranarray(_parse_data(rows, len(names)))
+            blocks[-1].columns = {n: matrix[:, i] for i, n in enumerate(names)}
+            matrices.append(matrix)
+        names = None
+        rows.clear()
+
+    for line in lines:
+        line = line.strip()
+
+        if names:
+            if line and not line.startswith("TEST RESULTS"):
+                rows.append(line)
+                continue
+            finish_data()
+        elif names == []:
+            if line:
+                names = line.split()
+            continue
+
+        key, _, value = line.partition(":")
+        value = value.strip()
+
+        if key.startswith("Attribute #"):
+            attributes.append(value)
+        elif key == "SETUP":
+            blocks.append(Block(setup=value.split()[0], date="", time="", sources={}))
+        elif key == "DATE":
+            blocks[-1].date = value
+        elif key == "TIME":
+            blocks[-1].time = value
+        elif key == "ID":
+            source = {"id": value}
+            blocks[-1].sources[value] = source
+        elif key in _SOURCE_FIELDS and source is not None:
+            name, convert = _SOURCE_FIELDS[key]
+            source[name] = convert(value)
+        elif key == "DATA":
+            source = None
+            blocks[-1].sources = {k: Source(**v) for k, v in blocks[-1].sources.items()}
+            names = []
+
+    finish_data()
+    return Measurement(path=path, attributes=attributes, blocks=blocks), matrices
+
+
+def _cache_key(path: Path) -> str:
+    digest = hashlib.sha1(str(path.absolute()).encode()).hexdigest()[:12]
+    return f"{path.stem}_{digest}"
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _atomic_write(path: Path, write):
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _significant(x: np.ndarray, digits: int) -> np.ndarray:
+    """Round ``x`` to ``digits`` significant digits."""
+    exp = np.floor(np.log10(np.abs(np.where(x == 0, 1, x))))
+    scale = 10.0 ** (digits - 1 - exp)
+    return np.round(x * scale) / scale
+
+
+def _encode(columns: dict[str, np.ndarray], offset: int = 0):
+    """Encode the columns of a block for the cache.
+
+    Constant columns (including all-NaN ones) are only stored in the header.
+    Variable columns are stored as float32 if they have at most
+    `FLOAT32_DIGITS` significant digits, which float32 represents exactly
+    enough to round-trip, and as float64 otherwise. Every column starts at an
+    8 byte aligned offset.
+
+    Returns:
+        The column header entries and the encoded data chunks.
+    """
+    header, chunks = [], []
+    for name, column in columns.items():
+        if len(column) == 0 or np.array_equal(
+            column, np.full_like(column, column[0]), equal_nan=True
+        ):
+            value = float(column[0]) if len(column) else 0.0
+            header.append({"name": name, "value": value})
+            continue
+
+        finite = column[np.isfinite(column)]
+        exact = np.allclose(
+            _significant(finite, FLOAT32_DIGITS), finite, rtol=1e-12, atol=0
+        )
+        data = column.astype("<f4" if exact else "<f8").tobytes()
+        data += bytes(-len(data) % 8)
+        header.append(
+            {"name": name, "dtype": "<f4" if exact else "<f8", "offset": offset}
+        )
+        chunks.append(data)
+        offset += len(data)
+    return header, chunks
+
+
+def _decode(data: np.ndarray, header: list[dict], rows: int, base: int = 0) -> dict:
+    """Return column views into the raw bytes ``data`` of an encoded block."""
+    columns = {}
+    for column in header:
+        if "value" in column:
+            columns[column["name"]] = np.broadcast_to(np.float64(column["value"]), rows)
+        else:
+            dtype = np.dtype(column["dtype"])
+            start = base + column["offset"]
+            columns[column["name"]] = data[start : start + rows * dtype.itemsize].view(
+                dtype
+            )
+    return columns
+
+
+def _write_cache(cache: Path, measurement: Measurement, stat, sha1):
+    offset = 0
+    blocks = []
+    chunks = []
+    for block in measurement.blocks:
+        header, data = _encode(block.columns, offset)
+        blocks.append(
+            {
+                "setup": block.setup,
+                "date": block.date,
+                "time": block.time,
+                "sources": [dataclasses.asdict(s) for s in block.sources.values()],
+                "columns": header,
+                "rows": len(block),
+            }
+        )
+        chunks.extend(data)
+        offset += sum(len(c) for c in data)
+
+    _atomic_write(cache.with_suffix(".bin"), lambda f: f.writelines(chunks))
+
+    meta = {
+        "version": CACHE_VERSION,
+        "path": str(measurement.path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": sha1,
+        "attributes": measurement.attributes,
+        "blocks": blocks,
+    }
+    _atomic_write(
+        cache.with_suffix(".json"), lambda f: f.write(json.dumps(meta).encode())
+    )
+    return meta
+
+
+def _map(path: Path) -> np.ndarray:
+    """Memory-map a file as raw bytes (np.memmap cannot map empty files)."""
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)
+
+
+def _read_cache(data: np.ndarray, meta: dict, path: Path, base: int = 0):
+    blocks = [
+        Block(
+            setup=b["setup"],
+            date=b["date"],
+            time=b["time"],
+            sources={s["id"]: Source(**s) for s in b["sources"]},
+            columns=_decode(data, b["columns"], b["rows"], base),
+        )
+        for b in meta["blocks"]
+    ]
+    return Measurement(path=path, attributes=meta["attributes"], blocks=blocks)
+
+
+## Packed store
+
+_stores = {}
+
+
+def pack(root=DATA_DIR, cache_dir=CACHE_DIR) -> Path:
+    """Pack the cache entries of all files below ``root`` into one store.
+
+    The encoded data of every file is concatenated into a single
+    ``store-<sha1>.bin`` in ``cache_dir``, with ``store.json`` naming that
+    data file and mapping each file to its cache header and byte offset. The
+    index is replaced last, so a reader always sees an index together with
+    the data it was written for. `load` serves unchanged files straight from
+    this one memory map.
+
+    Returns:
+        The path of the store data file.
+    """
+    cache_dir = Path(cache_dir)
+    index = {}
+    chunks = []
+    offset = 0
+    for path in sorted(Path(root).rglob("*.dat")):
+        load(path, cache_dir)
+        cache = cache_dir / _cache_key(path)
+        meta = json.loads(cache.with_suffix(".json").read_text())
+        meta["base"] = offset
+        index[str(path.absolute())] = meta
+        chunks.append(cache.with_suffix(".bin").read_bytes())
+        offset += len(chunks[-1])
+
+    sha1 = hashlib.sha1()
+    for chunk in chunks:
+        sha1.update(chunk)
+    store = cache_dir / f"store-{sha1.hexdigest()[:16]}.bin"
+    if not store.exists():
+        _atomic_write(store, lambda f: f.writelines(chunks))
+    _atomic_write(
+        cache_dir / "store.json",
+        lambda f: f.write(
+            json.dumps(
+                {
+                    "version": CACHE_VERSION,
+                    "data": store.name,
+                    "size": offset,
+                    "files": index,
+                }
+            ).encode()
+        ),
+    )
+
+    # Stores replaced earlier. Open memory maps keep their data until closed.
+    for old in cache_dir.glob("store*.bin"):
+        if old != store:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    return store
+
+
+def _store(cache_dir: Path):
+    """Return the (index, data) of the packed store in ``cache_dir``, if any."""
+    index_path = cache_dir / "store.json"
+    try:
+        mtime = index_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _stores.get(cache_dir, (None,))[0] != mtime:
+        index = json.loads(index_path.read_text())
+        data = np.empty(0, dtype=np.uint8)
+        name = index.get("data")
+        try:
+            if index.get("version") == CACHE_VERSION and name:
+                data = _map(cache_dir / name)
+        except FileNotFoundError:  # replaced by a concurrent `pack`
+            pass
+        if len(data) != index.get("size"):
+            index = {"files": {}}
+        _stores[cache_dir] = (mtime, index["files"], data)
+    return _stores[cache_dir][1:]
+
+
+def load(path, cache_dir=CACHE_DIR) -> Measurement:
+    """Load a ``.dat`` file through the binary cache.
+
+    The cache keeps the data of all blocks as one memory-mapped file of
+    compactly encoded columns next to a JSON header holding the block layout
+    (see `_encode`). Files packed into the store of `pack` are served from
+    there. A cache entry is reused as long as the modification time and size of
+    the source file are unchanged, or, if they changed, as long as its content
+    hash still matches. Otherwise the file is parsed again.
+
+    Args:
+        path: Path of the ``.dat`` file.
+        cache_dir: Cache directory. Pass None to parse without caching.
+    """
+    path = Path(path)
+    if cache_dir is None:
+        return parse(path)[0]
+
+    cache_dir = Path(cache_dir)
+    stat = path.stat()
+
+    store = _store(cache_dir)
+    if store is not None:
+        index, data = store
+        meta = index.get(str(path.absolute()))
+        if meta and (meta["mtime_ns"], meta["size"]) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            return _read_cache(data, meta, path, meta["base"])
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache = cache_dir / _cache_key(path)
+
+    meta = None
+    if cache.with_suffix(".json").exists():
+        meta = json.loads(cache.with_suffix(".json").read_text())
+        if meta.get("version") != CACHE_VERSION:
+            meta = None
+
+    if meta is not None:
+        if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+            return _read_cache(_map(cache.with_suffix(".bin")), meta, path)
+
+        sha1 = _file_hash(path)
+        if meta["sha1"] == sha1:
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _atomic_write(
+                cache.with_suffix(".json"),
+                lambda f: f.write(json.dumps(meta).encode()),
+            )
+            return _read_cache(_map(cache.with_suffix(".bin")), meta, path)
+    else:
+        sha1 = _file_hash(path)
+
+    measurement = parse(path)[0]
+    meta = _write_cache(cache, measurement, stat, sha1)
+    return _read_cache(_map(cache.with_suffix(".bin")), meta, path)
+
+
+def load_all(root=DATA_DIR, cache_dir=CACHE_DIR) -> dict[Path, Measurement]:
+    """Load every ``.dat`` file below ``root``, keyed by path."""
+    return {path: load(path, cache_dir) for path in sorted(Path(root).rglob("*.dat"))}
+
+
+if __name__ == "__main__":
+    store = pack()
+    index = json.loads((store.parent / "store.json").read_text())["files"]
+    full = sum(
+        len(b["columns"]) * b["rows"] * 8 for m in index.values() for b in m["blocks"]
+    )
+    print(
+        f"Packed {len(index)} files into {store}: "
+        f"{store.stat().st_size / 1e3:.0f} kB ({full / 1e3:.0f} kB as float64)"
+    )
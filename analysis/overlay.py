@@ -0,0 +1,288 @@
+from pathlib import Path
+
+import klayout.db as kdb
+import numpy as np
+from kfactory import KCLayout
+
+from pdk.components import compute_l_mesa
+
+GDS_PATH = Path("full_adder.gds")
+
+# Masks with their own overlay error, in the order of the shift arrays
+LAYERS = ("W_GATE", "AL2O3", "ITO_CHANNEL", "NI_CONTACTS")
+W, A, I, N = range(len(LAYERS))
+
+# Layout cells of the devices. `padded_transistor` is flattened, so its
+# transistor is found through the cell and not as a `transistor` instance.
+TRANSISTOR_CELLS = ("transistor", "padded_transistor")
+VIA_CELLS = ("via",)
+
+# Gate and contacts are drawn this much wider than the mesa, see `transistor`
+W_CONTACT_EXTRA = 4.0
+
+# Minimum dimensions in um for a device to count as functional:
+# - overlap: gate overlap of the source and drain contacts. Below 0 part of
+#   the channel is ungated.
+# - contact: length of the mesa below each contact.
+# - margin: gate extension beyond the mesa across the channel. Below 0 an
+#   ungated ITO strip shunts source and drain.
+# - enclosure: enclosure of the via opening by both pads.
+RULES = {"overlap": 0.0, "contact": 0.5, "margin": 0.0, "enclosure": 0.0}
+
+VARIANT_KEYS = ("l_gate", "l_overlap", "w_mesa")
+
+
+def _direction(orientation: float) -> kdb.DVector:
+    angle = np.deg2rad(orientation)
+    return kdb.DVector(np.cos(angle), np.sin(angle))
+
+
+def extract(c=None) -> dict:
+    """Find every placed transistor and via of a mask.
+
+    Identical devices in the same orientation are merged, so the analysis cost
+    does not grow with the number of placed copies.
+
+    Args:
+        c: Top component, e.g. the mask of `main`. Defaults to the top cell of
+            `GDS_PATH`, whose cells carry their gdsfactory settings and ports.
+
+    Returns:
+        Mapping with the ``transistors`` and the ``vias``. Both map to column
+        arrays, one entry per distinct device, with the number ``n`` of placed
+        copies. Transistors have ``l_gate``, ``l_overlap``, ``w_mesa``,
+        ``l_mesa`` and the ``frame`` of shape (n, 2, 2), whose rows are the
+        source to drain and the across-channel (``g1`` port) direction in mask
+        coordinates. Vias have the pad ``size`` and the opening ``inset``.
+    """
+    if c is None:
+        kcl = KCLayout("overlay")
+        kcl.read(GDS_PATH)
+        top = kcl.layout.top_cell()
+    else:
+        kcl, top = c.kcl, c.kdb_cell
+    layout = kcl.layout
+
+    kinds = {}
+    for ci in range(layout.cells()):
+        name = kcl[ci].function_name
+        if name in TRANSISTOR_CELLS:
+            kinds[ci] = "transistor"
+        elif name in VIA_CELLS:
+            kinds[ci] = "via"
+
+    it = kdb.RecursiveInstanceIterator(layout, top)
+    it.targets = list(kinds)
+    it.unselect_cells(list(kinds))
+
+    transistors, vias = [], []
+    cells = {}
+    while not it.at_end():
+        ci = it.inst_cell().cell_index()
+        if ci not in cells:
+            kcell = kcl[ci]
+            settings = kcell.settings.model_dump()
+            if kinds[ci] == "via":
+                size = settings.get("size", (20, 20))
+                cells[ci] = (float(size[0]), float(size[1]), settings.get("inset", 2))
+            else:
+                l_mesa = settings.get("l_mesa") or compute_l_mesa(
+                    settings["l_gate"], settings["l_overlap"]
+                )
+                cells[ci] = (
+                    settings["l_gate"],
+                    settings["l_overlap"],
+                    settings["w_mesa"],
+                    l_mesa,
+                    _direction(kcell.ports["d"].orientation),
+                    _direction(kcell.ports["g1"].orientation),
+                )
+        if kinds[ci] == "via":
+            vias.append(cells[ci])
+        else:
+            *params, x, y = cells[ci]
+            trans = it.dtrans() * it.inst_dtrans()
+            x, y = trans * x, trans * y
+            transistors.append(params + [x.x, x.y, y.x, y.y])
+        it.next()
+
+    t, n_t = np.unique(
+        np.array(transistors, float).reshape(-1, 8).round(6), axis=0, return_counts=True
+    )
+    v, n_v = np.unique(np.array(vias, float).reshape(-1, 3), axis=0, return_counts=True)
+    return {
+        "transistors": {
+            "l_gate": t[:, 0],
+            "l_overlap": t[:, 1],
+            "w_mesa": t[:, 2],
+            "l_mesa": t[:, 3],
+            "frame": t[:, 4:].reshape(-1, 2, 2),
+            "n": n_t,
+        },
+        "vias": {"size": v[:, :2], "inset": v[:, 2], "n": n_v},
+    }
+
+
+def sample_shifts(n: int, tolerances, seed: int = 0) -> np.ndarray:
+    """Sample per-layer overlay shifts for every tolerance.
+
+    Every layer is shifted by an independent normal translation whose 3 sigma
+    per axis equals the tolerance. All tolerances share the same standard
+    normal samples, so yields are comparable across tolerances.
+
+    Returns:
+        Shifts in um of shape (n_tolerances, n, len(LAYERS), 2).
+    """
+    z = np.random.default_rng(seed).standard_normal((n, len(LAYERS), 2))
+    return np.asarray(tolerances, dtype=float)[:, None, None, None] / 3 * z
+
+
+def transistor_metrics(transistors: dict, shifts: np.ndarray, rules=RULES) -> dict:
+    """Recompute the transistor geometry for every sampled overlay shift.
+
+    Args:
+        transistors: Transistors as returned by `extract`.
+        shifts: Layer shifts of shape (..., len(LAYERS), 2) in mask
+            coordinates, see `sample_shifts`.
+        rules: Minimum dimensions, see `RULES`.
+
+    Returns:
+        Mapping of arrays of shape (..., n_transistors): the worst gate
+        ``overlap`` of source and drain, the gated ``channel_length``, the
+        shorter mesa ``contact`` length below source and drain, the channel
+        ``width`` covered by gate and contacts, the gate ``margin`` across the
+        channel and whether the device stays ``functional``.
+    """
+    # Shifts along (x) and across (y) the channel of every device
+    s = np.einsum("dkj,...lj->...dlk", transistors["frame"], shifts)
+    g, i, n = s[..., W, :], s[..., I, :], s[..., N, :]
+
+    l_gate, l_overlap = transistors["l_gate"], transistors["l_overlap"]
+    w_mesa, l_mesa = transistors["w_mesa"], transistors["l_mesa"]
+    overlap_s = l_overlap + n[..., 0] - g[..., 0]
+    overlap_d = l_overlap - n[..., 0] + g[..., 0]
+    contact = (l_mesa - l_gate) / 2 - np.abs(n[..., 0] - i[..., 0])
+
+    half = (w_mesa + W_CONTACT_EXTRA) / 2
+    top = np.minimum(w_mesa / 2 + i[..., 1], half + np.minimum(g[..., 1], n[..., 1]))
+    bottom = np.maximum(
+        -w_mesa / 2 + i[..., 1], -half + np.maximum(g[..., 1], n[..., 1])
+    )
+    overlap = np.minimum(overlap_s, overlap_d)
+    margin = W_CONTACT_EXTRA / 2 - np.abs(i[..., 1] - g[..., 1])
+    return {
+        "overlap": overlap,
+        "channel_length": l_gate
+        - np.maximum(0, -overlap_s)
+        - np.maximum(0, -overlap_d),
+        "contact": contact,
+        "width": np.maximum(top - bottom, 0),
+        "margin": margin,
+        "functional": (overlap >= rules["overlap"])
+        & (contact >= rules["contact"])
+        & (margin >= rules["margin"]),
+    }
+
+
+def via_metrics(vias: dict, shifts: np.ndarray, rules=RULES) -> dict:
+    """Recompute the via opening enclosure for every sampled overlay shift.
+
+    Returns:
+        Mapping of arrays of shape (..., n_vias): the worst ``enclosure`` of
+        the opening by either pad and whether the via stays ``functional``.
+    """
+    a = shifts[..., A, :]
+    offset = np.maximum(
+        np.abs(a - shifts[..., W, :]).max(axis=-1),
+        np.abs(a - shifts[..., N, :]).max(axis=-1),
+    )
+    enclosure = vias["inset"] - offset[..., None]
+    return {"enclosure": enclosure, "functional": enclosure >= rules["enclosure"]}
+
+
+def robustness(
+    devices: dict,
+    tolerances=(0.5, 1.0, 2.0, 3.0),
+    n_samples: int = 4000,
+    seed: int = 0,
+    rules=RULES,
+) -> dict:
+    """Estimate the overlay yield of every variant for a range of tolerances.
+
+    Args:
+        devices: Devices as returned by `extract`.
+        tolerances: Overlay tolerances (3 sigma per axis and layer) in um.
+        n_samples: Number of sampled overlay shifts per tolerance.
+        seed: Seed of the sampled shifts.
+        rules: Minimum dimensions, see `RULES`.
+
+    Returns:
+        Mapping with the ``tolerance`` array and, for the ``transistors`` per
+        (l_gate, l_overlap, w_mesa) variant and for the ``vias`` per pad size
+        and inset, the key columns, the number ``n`` of placed devices and the
+        ``functional`` fraction of shape (n_groups, n_tolerances). The
+        transistors also get ``overlap_q05`` and ``contact_q05``, the lowest
+        5% quantile of the overlap and contact length of any of their
+        orientations, in um.
+    """
+    shifts = sample_shifts(n_samples, tolerances, seed)
+    out = {"tolerance": np.asarray(tolerances, dtype=float)}
+
+    t = devices["transistors"]
+    metrics = transistor_metrics(t, shifts, rules)
+    keys = np.column_stack([t[k] for k in VARIANT_KEYS])
+    variants, inverse = np.unique(keys, axis=0, return_inverse=True)
+    out["transistors"] = _group(variants, inverse.ravel(), t["n"], metrics)
+    out["transistors"].update(zip(VARIANT_KEYS, variants.T))
+    for name in ("overlap", "contact"):
+        q = np.full((len(variants), len(out["tolerance"])), np.inf)
+        np.minimum.at(q, inverse.ravel(), np.quantile(metrics[name], 0.05, axis=1).T)
+        out["transistors"][f"{name}_q05"] = q
+
+    v = devices["vias"]
+    keys = np.column_stack([v["size"], v["inset"]])
+    groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+    out["vias"] = _group(groups, inverse.ravel(), v["n"], via_metrics(v, shifts, rules))
+    out["vias"].update(size=groups[:, :2], inset=groups[:, 2])
+    return out
+
+
+def _group(groups, inverse, counts, metrics: dict) -> dict:
+    """Return the count-weighted functional fraction per group and tolerance."""
+    n = np.bincount(inverse, counts, minlength=len(groups))
+    # Fraction of the samples per distinct device, (n_tolerances, n_devices)
+    works = metrics["functional"].mean(axis=1)
+    functional = np.stack(
+        [np.bincount(inverse, counts * w, minlength=len(groups)) for w in works],
+        axis=1,
+    )
+    return {"n": n.astype(int), "functional": functional / n[:, None]}
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    devices = extract()
+    found = time.perf_counter()
+    result = robustness(devices)
+    done = time.perf_counter()
+
+    t = devices["transistors"]
+    print(
+        f"{t['n'].sum()} transistors ({len(t['n'])} distinct), "
+        f"{devices['vias']['n'].sum()} vias, extracted in {found - start:.2f} s, "
+        f"analyzed in {done - found:.2f} s"
+    )
+    tolerances = "  ".join(f"{x:4.1f}um" for x in result["tolerance"])
+    print(f"{'l_gate/l_ov/w_mesa':20s} {'n':>5s}  {tolerances}")
+    r = result["transistors"]
+    for k in range(len(r["n"])):
+        key = f"{r['l_gate'][k]:g}/{r['l_overlap'][k]:g}/{r['w_mesa'][k]:g}"
+        yields = "  ".join(f"{x:6.1%}" for x in r["functional"][k])
+        print(f"{key:20s} {r['n'][k]:5d}  {yields}")
+    r = result["vias"]
+    for k in range(len(r["n"])):
+        key = f"via {r['size'][k][0]:g}x{r['size'][k][1]:g} inset {r['inset'][k]:g}"
+        yields = "  ".join(f"{x:6.1%}" for x in r["functional"][k])
+        print(f"{key:20s} {r['n'][k]:5d}  {yields}")
@@ -0,0 +1,161 @@
+import itertools
+
+import numpy as np
+
+from analysis.aggregate import KEYS, device_table, join
+from analysis.catalog import Catalog
+from analysis.circuit import TFTModel, rank_full_adders, resistance
+from analysis.measurement import CACHE_DIR
+
+# Parameter values the planner may choose from
+L_GATES = [5, 10, 15, 20, 30, 40]
+L_OVERLAPS = [2, 5, 10, 20]
+W_MESAS = [10, 20, 50, 100]
+R_TYPES = [("W", 500), ("W", 5000), ("ITO", 0.05), ("ITO", 0.1), ("ITO", 0.2)]
+
+# Structures whose measurements mark a (l_gate, l_overlap, w_mesa) variant dead
+EVIDENCE = ("transistor", "inverter", "full_adder")
+
+
+def fits_grid(variant) -> bool:
+    """Return whether the full adder of ``variant`` fits the layout grid.
+
+    Variants that do not fit come out "invalid" (see `main.fits_grid`) and
+    would waste their slot.
+    """
+    import main
+
+    l_gate, l_overlap, w_mesa = variant[:3]
+    return main.fits_grid(
+        main.padded_transistor(
+            l_gate, l_overlap, w_mesa, main.WIRE_WIDTH, main.H_SEPARATION
+        )
+    )
+
+
+def fit_model(table: dict) -> TFTModel:
+    """Return a `TFTModel` with the median parameters of the working TFTs.
+
+    Falls back to the default model parameters where nothing was measured.
+    """
+    tfts = (table["structure"] == "transistor") & table["works"]
+    default = TFTModel()
+    params = {}
+    for name in ("mobility", "v_th", "ss"):
+        values = table[name][tfts]
+        valid = np.isfinite(values) & ((values > 0) | (name == "v_th"))
+        params[name] = (
+            float(np.median(values[valid])) if valid.any() else getattr(default, name)
+        )
+    return TFTModel(**params)
+
+
+def dead(table: dict, variants: dict) -> np.ndarray:
+    """Return which variants were measured but never worked on any wafer."""
+    wafers = np.unique(table["wafer"][~np.isnan(table["wafer"])])
+    n = np.zeros(len(variants[KEYS[0]]))
+    works = np.zeros_like(n)
+    for structure in EVIDENCE:
+        rows = np.flatnonzero(table["structure"] == structure)
+        joined = join(table, rows, variants, wafers)
+        n += joined["n"].sum(axis=1)
+        works += np.nansum(joined["yield"] * joined["n"], axis=1)
+    return (n > 0) & (works == 0)
+
+
+def coverage_order(points: np.ndarray, first: int) -> np.ndarray:
+    """Order ``points`` by greedy farthest-point sampling, starting at ``first``.
+
+    Every next point is the one farthest from all points chosen before, so any
+    prefix of the order covers the point set as evenly as possible.
+    """
+    order = [first]
+    distance = np.linalg.norm(points - points[first], axis=1)
+    for _ in range(len(points) - 1):
+        nxt = int(np.argmax(distance))
+        order.append(nxt)
+        distance = np.minimum(distance, np.linalg.norm(points - points[nxt], axis=1))
+    return np.array(order)
+
+
+def select(
+    candidates,
+    capacity: int,
+    table: dict,
+    model: TFTModel,
+    r_type=("W", 5000),
+    min_margin: float = 0.0,
+) -> list:
+    """Choose up to ``capacity`` full adder variants from ``candidates``.
+
+    Candidates that do not fit the layout grid or were measured dead are
+    dropped. The full adders of the rest are simulated with ``model``, and those
+    with a logic margin above ``min_margin`` form the promising region. It is
+    covered evenly in log parameter space. Remaining slots go to the
+    next-best non-promising variants.
+
+    Args:
+        candidates: Sequence of (l_gate, l_overlap, w_mesa[, r_type]) tuples.
+        capacity: Number of variants that fit the layout block.
+        table: Device table as returned by `device_table`.
+        model: TFT compact model.
+        r_type: Load resistor of candidates without their own ``r_type``.
+        min_margin: Logic margin (see `noise_margin`) a variant needs to count
+            as promising.
+
+    Returns:
+        The chosen candidates, in the order of ``candidates``.
+    """
+    candidates = [v for v in candidates if fits_grid(v)]
+    keys = np.array([v[:3] for v in candidates], dtype=float)
+    alive = ~dead(table, dict(zip(KEYS, keys.T)))
+    candidates = [v for v, a in zip(candidates, alive) if a]
+    if len(candidates) <= capacity:
+        return candidates
+
+    full = [tuple(v[:3]) + ((v[3] if len(v) > 3 else r_type),) for v in candidates]
+    ranked = rank_full_adders(full, model=model)
+    margin = dict((variant, m) for variant, m, _ in ranked)
+    margin = np.array([margin[v] for v in full])
+
+    points = np.log(np.array([v[:3] + (resistance(v[3]),) for v in full], dtype=float))
+    points = (points - points.mean(axis=0)) / np.maximum(points.std(axis=0), 1e-9)
+
+    promising = np.flatnonzero(margin > min_margin)
+    chosen = []
+    if len(promising):
+        order = coverage_order(points[promising], int(np.argmax(margin[promising])))
+        chosen = list(promising[order][:capacity])
+    taken = set(chosen)
+    rest = [i for i in np.argsort(-margin, kind="stable") if i not in taken]
+    chosen += rest[: capacity - len(chosen)]
+    return [candidates[i] for i in sorted(chosen)]
+
+
+def plan_variants(
+    t_variants,
+    r_full_adder_variants,
+    catalog: Catalog | None = None,
+    cache_dir=CACHE_DIR,
+):
+    """Choose the `main` variant tables from the measurement data.
+
+    Each table gets as many variants as the current one has valid full adders,
+    so the planned blocks use the same area.
+
+    Returns:
+        The planned ``t_variants`` and ``r_full_adder_variants``.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    table = device_table(catalog.query(latest=True), cache_dir)
+    model = fit_model(table)
+
+    def capacity(variants):
+        return sum(fits_grid(v) for v in variants)
+
+    t_candidates = list(itertools.product(L_GATES, L_OVERLAPS, W_MESAS))
+    r_candidates = list(itertools.product(L_GATES, L_OVERLAPS, W_MESAS, R_TYPES))
+    return (
+        select(t_candidates, capacity(t_variants), table, model),
+        select(r_candidates, capacity(r_full_adder_variants), table, model),
+    )
@@ -0,0 +1,293 @@
+import argparse
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+from analysis import inverter, tlm, transfer
+from analysis.catalog import Catalog
+from analysis.measurement import CACHE_DIR
+
+PLOTS_DIR = Path(".cache/plots")
+
+# Panels of a summary sheet: name -> (x label, y label, color label, log y)
+PANELS = {
+    "transfer": ("$V_G$ (V)", "$|I_D|$ (A)", "$V_D$ (V)", True),
+    "vtc": ("$V_{in}$ (V)", "$V_{out}$ (V)", "$V_{DD}$ (V)", False),
+    "res": ("$V$ (V)", "$|I|$ (A)", "$\\log_{10} L$ (um)", True),
+    "tlm": ("$L$ (um)", "$R$ ($\\Omega$)", "$V_G$ (V)", True),
+}
+
+
+def decimate(x, y, n_bins: int):
+    """Reduce every curve to the minimum and maximum of ``n_bins`` bins.
+
+    The extremes of each bin are kept in their original order, so the
+    decimated curve has the same envelope as the full one when drawn at a
+    resolution of about ``n_bins`` pixels. NaN points are dropped.
+
+    Args:
+        x: Sweep values of shape (n_points,) or (n, n_points).
+        y: Curves of shape (n, n_points).
+        n_bins: Number of bins per curve.
+
+    Returns:
+        The decimated ``x`` and ``y``, both of shape (n, 2 * n_bins), NaN
+        padded where a bin is empty.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    n, n_points = y.shape
+    if 2 * n_bins >= n_points:
+        return x, y
+
+    size = -(-n_points // n_bins)
+    pad = ((0, 0), (0, size * n_bins - n_points))
+    x = np.pad(x, pad, constant_values=np.nan).reshape(n, n_bins, size)
+    y = np.pad(y, pad, constant_values=np.nan).reshape(n, n_bins, size)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    lo = np.argmin(np.where(valid, y, np.inf), axis=2)
+    hi = np.argmax(np.where(valid, y, -np.inf), axis=2)
+    index = np.sort(np.stack([lo, hi], axis=2), axis=2)
+
+    x = np.take_along_axis(x, index, axis=2)
+    y = np.take_along_axis(y, index, axis=2)
+    empty = ~valid.any(axis=2)[..., None]
+    x = np.where(empty, np.nan, x).reshape(n, 2 * n_bins)
+    y = np.where(empty, np.nan, y).reshape(n, 2 * n_bins)
+    return x, y
+
+
+def add_curves(
+    ax,
+    x,
+    y,
+    values=None,
+    log: bool = False,
+    i_floor: float = 1e-12,
+    max_points: int | None = None,
+    **kwargs,
+) -> LineCollection:
+    """Draw many curves as one `LineCollection`.
+
+    Args:
+        ax: Matplotlib axes.
+        x: Sweep values of shape (n_points,) or (n, n_points), NaN padded.
+        y: Curves of shape (n, n_points), NaN padded.
+        values: Optional value per curve that colors it through the colormap.
+            Curves with a NaN value are gray.
+        log: Draw ``|y|`` clipped at ``i_floor`` on a log scale, e.g. for
+            currents that change sign in the noise.
+        i_floor: Lower limit of the log scale.
+        max_points: Decimate curves longer than this, see `decimate`.
+        kwargs: Passed to `LineCollection`, e.g. ``cmap`` or ``linewidth``.
+
+    Returns:
+        The added collection.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    if log:
+        y = np.where(np.isnan(y), np.nan, np.maximum(np.abs(y), i_floor))
+        ax.set_yscale("log")
+    if max_points is not None:
+        x, y = decimate(x, y, max_points // 2)
+
+    kwargs.setdefault("linewidth", 0.8)
+    lines = LineCollection(np.stack([x, y], axis=-1), **kwargs)
+    if values is not None:
+        lines.set_array(np.asarray(values, dtype=float))
+        lines.set_cmap(lines.get_cmap().with_extremes(bad="0.5"))
+    ax.add_collection(lines)
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    if finite.any():
+        lo, hi = y[finite].min(), y[finite].max()
+        margin = 0.02 * (hi - lo) or 1.0
+        ax.set_xlim(x[finite].min(), x[finite].max())
+        ax.set_ylim(*((lo / 2, hi * 2) if log else (lo - margin, hi + margin)))
+    return lines
+
+
+def collect(catalog: Catalog, cache_dir=CACHE_DIR) -> dict:
+    """Stack every curve of the catalog that a summary sheet shows.
+
+    Returns:
+        Mapping of panel name (see `PANELS`) to the ``x`` and ``y`` arrays of
+        its curves, the color ``value`` and the catalog ``record`` row of every
+        curve.
+    """
+    curves = transfer.stack_transfer(catalog, cache_dir)
+    vtc = inverter.stack_vtc(catalog, cache_dir)
+    res = tlm.stack_res(catalog, cache_dir)
+
+    # One resistance over length curve per TLM series and gate bias
+    series = tlm.stack_tlm(catalog, cache_dir)
+    order = np.argsort(series["length"], axis=1)  # NaN padding last
+    length = np.take_along_axis(series["length"], order, axis=1)
+    r = np.take_along_axis(series["r"], order[:, None, :], axis=2)
+    bias = np.isfinite(series["v_g"])
+    bias[:, 0] = True  # the NaN bias of ungated series
+    rows = np.nonzero(bias)
+
+    return {
+        "transfer": {
+            "x": curves["vg"],
+            "y": curves["i_d"],
+            "value": curves["vd"],
+            "record": curves["record"],
+        },
+        "vtc": {
+            "x": vtc["grid"],
+            "y": vtc["v_out"],
+            "value": vtc["vdd"],
+            "record": vtc["record"],
+        },
+        "res": {
+            "x": res["v"],
+            "y": res["i"],
+            "value": np.log10(res["length"]),
+            "record": res["record"],
+        },
+        "tlm": {
+            "x": length[rows[0]],
+            "y": r[rows],
+            "value": series["v_g"][rows],
+            "record": series["record"][rows[0]],
+        },
+    }
+
+
+def sheet_key(record, by: str):
+    """Return the sheet of ``record`` when grouping ``by`` wafer or variant."""
+    if by == "wafer":
+        return None if record.wafer is None else f"wafer{record.wafer}"
+    if record.l_gate is None:
+        return None
+    return f"{record.l_gate:g}_{record.l_overlap:g}_{record.w_mesa:g}"
+
+
+def sheets(catalog: Catalog, curves: dict, by: str = "wafer") -> dict:
+    """Split the collected curves into summary sheets.
+
+    Args:
+        catalog: Catalog the curves were collected from.
+        curves: Curves as returned by `collect`.
+        by: ``"wafer"`` for one sheet per wafer, ``"variant"`` for one sheet
+            per (l_gate, l_overlap, w_mesa) layout variant across wafers.
+
+    Returns:
+        Mapping of sheet name to its panels, each a mapping like those of
+        `collect` restricted to the curves of the sheet.
+    """
+    keys = [sheet_key(record, by) for record in catalog]
+    out = defaultdict(dict)
+    for panel, c in curves.items():
+        names = np.array([keys[i] for i in c["record"]], dtype=object)
+        for name in sorted(set(names) - {None}):
+            rows = np.flatnonzero(names == name)
+            x = c["x"] if c["x"].ndim == 1 else c["x"][rows]
+            out[name][panel] = dict(
+                x=x, y=c["y"][rows], value=c["value"][rows], record=c["record"][rows]
+            )
+    return dict(sorted(out.items()))
+
+
+def render(title: str, panels: dict, path, max_points: int | None = None) -> Path:
+    """Render one summary sheet to ``path`` (PNG, PDF, ... by its suffix).
+
+    Only the `PANELS` with curves on the sheet are drawn, two per row.
+
+    Uses the figure API without pyplot, so it needs no display and is safe to
+    call from worker processes. The margins are fixed, since an automatic
+    layout takes longer than drawing the curves.
+    """
+    shown = [panel for panel in PANELS if len(panels.get(panel, {}).get("y", ()))]
+    n_columns = min(len(shown), 2) or 1
+    n_rows = -(-len(shown) // n_columns) or 1
+    fig = Figure(figsize=(5.5 * n_columns, 4 * n_rows))
+    fig.subplots_adjust(
+        left=0.16 / n_columns,
+        right=0.97,
+        bottom=0.12 / n_rows,
+        top=1 - 0.14 / n_rows,
+        wspace=0.35,
+        hspace=0.35,
+    )
+    axes = fig.subplots(n_rows, n_columns, squeeze=False).ravel()
+    for ax in axes[len(shown) :]:
+        ax.set_axis_off()
+    for ax, panel in zip(axes, shown):
+        xlabel, ylabel, clabel, log = PANELS[panel]
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        c = panels[panel]
+        lines = add_curves(
+            ax, c["x"], c["y"], c["value"], log, max_points=max_points, cmap="viridis"
+        )
+        ax.set_title(f"{panel} ({len(c['y'])} curves)")
+        fig.colorbar(lines, ax=ax, label=clabel, pad=0.02)
+    fig.suptitle(title)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, dpi=150)
+    return path
+
+
+def render_all(
+    catalog: Catalog | None = None,
+    cache_dir=CACHE_DIR,
+    out_dir=PLOTS_DIR,
+    fmt: str = "png",
+    by=("wafer", "variant"),
+    workers: int | None = None,
+    max_points: int | None = 200,
+) -> list[Path]:
+    """Render the per-wafer and per-variant summary sheets in parallel.
+
+    The curves are stacked once, the sheets are rendered in a process pool.
+
+    Returns:
+        The paths of the written sheets, ``<out_dir>/<by>/<sheet>.<fmt>``.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    curves = collect(catalog, cache_dir)
+    jobs = [
+        (
+            name if group == "wafer" else f"{group} {name}",
+            panels,
+            Path(out_dir) / group / f"{name}.{fmt}",
+        )
+        for group in by
+        for name, panels in sheets(catalog, curves, group).items()
+    ]
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(render, title, panels, path, max_points)
+            for title, panels, path in jobs
+        ]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=PLOTS_DIR)
+    parser.add_argument("--format", default="png", help="png, pdf, svg, ...")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-points", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = render_all(
+        out_dir=args.out,
+        fmt=args.format,
+        workers=args.workers,
+        max_points=args.max_points or None,
+    )
+    print(f"Rendered {len(paths)} sheets in {time.perf_counter() - start:.2f} s")
+    for path in paths:
+        print(f"  {path}")
@@ -0,0 +1,300 @@
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from analysis.catalog import _REPEAT_TAGS, Catalog
+from analysis.measurement import CACHE_DIR, load
+from analysis.transfer import _step_column
+
+# Measurement conditions compared between two files of the same device:
+# kind -> (tag of the reference file, tag of the compared file). None is a
+# file without any condition tag.
+CONDITIONS = {
+    "hysteresis": ("up", "down"),
+    "photoresponse": ("no_light", "light"),
+    "swap": (None, "swap"),
+}
+KINDS = tuple(CONDITIONS) + ("drift",)
+
+# Setup compared per structure, in order of preference, and its output column.
+# Currents are compared in decades, voltages in V.
+SETUPS = {"NOT": "VOUT", "TRANSFER": "ID", "RES": None}
+CURRENT_SETUPS = ("TRANSFER", "RES")
+
+METRICS = ("shift", "rms", "max", "area", "log_ratio", "log_ratio_max")
+
+
+def _base_key(record, tag=None) -> tuple:
+    """Return the device of ``record`` without its repeat and ``tag`` tags."""
+    tags = tuple(t for t in record.tags if t not in _REPEAT_TAGS and t != tag)
+    return (
+        record.wafer,
+        record.anneal,
+        record.anneal_temp,
+        record.structure,
+        record.l_gate,
+        record.l_overlap,
+        record.w_mesa,
+        record.length,
+        tags,
+    )
+
+
+def find_pairs(catalog: Catalog) -> dict:
+    """Pair the related measurements of the catalog.
+
+    Condition pairs (see `CONDITIONS`) compare the latest measurement of a
+    device under both conditions, e.g. ``_no_light`` and ``_light``. Drift
+    pairs compare every repeat of a measurement (``_remeasured_N``,
+    ``_rerun``, ...) with the first one.
+
+    Returns:
+        Mapping with per pair the ``kind``, the ``reference`` and compared
+        ``record`` row of the catalog and the ``repeat`` number (0 for
+        condition pairs).
+    """
+    kind, reference, record, repeat = [], [], [], []
+
+    latest = catalog.rows(latest=True)
+    for name, (ref_tag, tag) in CONDITIONS.items():
+        refs = {}
+        for row in latest:
+            r = catalog[row]
+            tags = set(r.tags) - _REPEAT_TAGS
+            if ref_tag in tags or ref_tag is None and not tags:
+                refs[_base_key(r, ref_tag)] = row
+        for row in latest:
+            r = catalog[row]
+            if tag in r.tags and (ref := refs.get(_base_key(r, tag))) is not None:
+                kind.append(name)
+                reference.append(ref)
+                record.append(row)
+                repeat.append(0)
+
+    devices = defaultdict(list)
+    for row, r in enumerate(catalog):
+        devices[r.device].append(row)
+    for rows in devices.values():
+        rows.sort(
+            key=lambda i: (catalog[i].timestamp or datetime.min, catalog[i].remeasure)
+        )
+        for n, row in enumerate(rows[1:], 1):
+            kind.append("drift")
+            reference.append(rows[0])
+            record.append(row)
+            repeat.append(n)
+
+    return {
+        "kind": np.array(kind, dtype=object),
+        "reference": np.array(reference, dtype=int),
+        "record": np.array(record, dtype=int),
+        "repeat": np.array(repeat, dtype=int),
+    }
+
+
+def _curves(record, setup: str, cache_dir=CACHE_DIR) -> dict:
+    """Return the curves of one setup of ``record`` by step value.
+
+    Returns:
+        Mapping of the rounded step value (NaN without a step source) to the
+        (x, y) arrays of the curve, sorted by x.
+    """
+    block = load(record.path, cache_dir)[setup]
+    sweep = next(s for s in block.sources.values() if s.mode == "SWEEP")
+    step = next((s for s in block.sources.values() if s.mode == "STEP"), None)
+    name = SETUPS[setup] or f"I{sweep.id}"
+    x = block[f"V{sweep.id}"]
+    order = np.argsort(x)
+
+    values = step.values if step is not None else [np.nan]
+    return {
+        round(float(v), 3): (x[order], block[_step_column(name, k)][order])
+        for k, v in enumerate(values)
+    }
+
+
+def stack_pairs(catalog, pairs: dict, cache_dir=CACHE_DIR, n_grid: int = 101):
+    """Align the curves of every pair on a common voltage grid.
+
+    Every step (supply or drain voltage) present in both files of a pair
+    becomes one row, matched by value since e.g. down sweeps step in reverse
+    order. The grid of a row spans the sweep range both curves cover.
+
+    Returns:
+        Mapping with per row the ``pair`` index, the ``setup``, the ``step``
+        value, the ``grid`` of shape (n, n_grid) and the reference ``y_ref``
+        and compared ``y`` curves of the same shape (raw currents in A or
+        voltages in V).
+    """
+    index, setups, steps, grids, y_ref, y = [], [], [], [], [], []
+    for i, (a, b) in enumerate(zip(pairs["reference"], pairs["record"])):
+        common = [
+            s for s in SETUPS if s in catalog[a].setups and s in catalog[b].setups
+        ]
+        if not common:
+            continue
+        setup = common[0]
+        curves_a = _curves(catalog[a], setup, cache_dir)
+        curves_b = _curves(catalog[b], setup, cache_dir)
+        for step, (x_a, a_y) in curves_a.items():
+            if step not in curves_b and not (np.isnan(step) and len(curves_b) == 1):
+                continue
+            x_b, b_y = curves_b.get(step, next(iter(curves_b.values())))
+            lo, hi = max(x_a[0], x_b[0]), min(x_a[-1], x_b[-1])
+            if not lo < hi:
+                continue
+            grid = np.linspace(lo, hi, n_grid)
+            index.append(i)
+            setups.append(setup)
+            steps.append(step)
+            grids.append(grid)
+            y_ref.append(np.interp(grid, x_a, a_y))
+            y.append(np.interp(grid, x_b, b_y))
+
+    shape = (len(index), n_grid)
+    return {
+        "pair": np.array(index, dtype=int),
+        "setup": np.array(setups, dtype=object),
+        "step": np.array(steps, dtype=float),
+        "grid": np.array(grids, dtype=float).reshape(shape),
+        "y_ref": np.array(y_ref, dtype=float).reshape(shape),
+        "y": np.array(y, dtype=float).reshape(shape),
+    }
+
+
+def _crossing(grid: np.ndarray, y: np.ndarray, level: np.ndarray) -> np.ndarray:
+    """Return the first x of every row where ``y`` crosses ``level``."""
+    rows = np.arange(len(y))
+    d = y - level[:, None]
+    cross = np.signbit(d[:, :-1]) != np.signbit(d[:, 1:])
+    k = np.argmax(cross, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = d[rows, k] / (d[rows, k] - d[rows, k + 1])
+    x = grid[rows, k] + frac * (grid[rows, k + 1] - grid[rows, k])
+    return np.where(cross.any(axis=1), x, np.nan)
+
+
+def compare(stacked: dict, i_floor: float = 1e-12) -> dict:
+    """Compute the difference metrics of all aligned curve pairs at once.
+
+    Currents are compared as log10(|I|), clipped at ``i_floor``, voltages
+    directly. The voltage ``shift`` is taken where the curves cross the middle
+    of the reference curve's range, which is V_M for an inverter and a
+    constant current threshold voltage for a transistor.
+
+    Returns:
+        Mapping of per-row arrays:
+
+        - ``shift``: sweep voltage shift of the compared curve in V (for
+          hysteresis the down minus the up sweep).
+        - ``rms`` and ``max``: RMS and maximum absolute difference, in decades
+          for currents and V for voltages.
+        - ``area``: integral of the absolute difference over the sweep, the
+          hysteresis loop area for up/down sweeps.
+        - ``log_ratio`` and ``log_ratio_max``: mean and maximum of
+          log10(|I| / |I_ref|) for currents (NaN for voltages), e.g. the
+          photoresponse or, for a swapped TLM, the resistance asymmetry.
+    """
+    grid = stacked["grid"]
+    current = np.isin(stacked["setup"], CURRENT_SETUPS)[:, None]
+    with np.errstate(divide="ignore"):
+        log_ref = np.log10(np.maximum(np.abs(stacked["y_ref"]), i_floor))
+        log_y = np.log10(np.maximum(np.abs(stacked["y"]), i_floor))
+    y_ref = np.where(current, log_ref, stacked["y_ref"])
+    y = np.where(current, log_y, stacked["y"])
+
+    diff = y - y_ref
+    level = (
+        np.nanmax(y_ref, axis=1, initial=-np.inf)
+        + np.nanmin(y_ref, axis=1, initial=np.inf)
+    ) / 2
+    shift = _crossing(grid, y, level) - _crossing(grid, y_ref, level)
+    shift = np.where(stacked["setup"] == "RES", np.nan, shift)
+
+    area = np.sum(
+        (np.abs(diff[:, 1:]) + np.abs(diff[:, :-1])) / 2 * np.diff(grid, axis=1),
+        axis=1,
+    )
+    current = current[:, 0]
+    return {
+        "shift": shift,
+        "rms": np.sqrt(np.nanmean(diff**2, axis=1)),
+        "max": np.nanmax(np.abs(diff), axis=1, initial=0),
+        "area": area,
+        "log_ratio": np.where(current, np.nanmean(diff, axis=1), np.nan),
+        "log_ratio_max": np.where(
+            current, np.nanmax(diff, axis=1, initial=-np.inf), np.nan
+        ),
+    }
+
+
+def summarize(catalog, pairs: dict, stacked: dict, metrics: dict) -> dict:
+    """Average the metrics per wafer, kind of comparison and setup.
+
+    Grouping by setup keeps current metrics in decades apart from voltage
+    metrics in V.
+
+    Returns:
+        Mapping with the (wafer, kind, setup) ``group`` keys, the number of
+        compared curves ``n`` per group and the NaN-ignoring mean of the
+        absolute value of every metric.
+    """
+    keys = [
+        (catalog[pairs["record"][i]].wafer, pairs["kind"][i], setup)
+        for i, setup in zip(stacked["pair"], stacked["setup"])
+    ]
+    group = sorted(set(keys), key=str)
+    lookup = {key: i for i, key in enumerate(group)}
+    inverse = np.array([lookup[key] for key in keys], dtype=int)
+
+    summary = {"group": np.empty(len(group), dtype=object)}
+    summary["group"][:] = group
+    summary["n"] = np.bincount(inverse, minlength=len(group))
+    for name in METRICS:
+        x = np.abs(metrics[name])
+        valid = np.isfinite(x)
+        total = np.bincount(inverse, np.where(valid, x, 0), minlength=len(group))
+        count = np.bincount(inverse, valid, minlength=len(group))
+        with np.errstate(invalid="ignore"):
+            summary[name] = total / count
+    return summary
+
+
+def compare_all(catalog: Catalog | None = None, cache_dir=CACHE_DIR, **kwargs):
+    """Pair, align and compare every related measurement in the catalog.
+
+    Returns:
+        The catalog, the pairs (see `find_pairs`), the aligned curves (see
+        `stack_pairs`) and their metrics (see `compare`).
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    pairs = find_pairs(catalog)
+    stacked = stack_pairs(catalog, pairs, cache_dir, **kwargs)
+    return catalog, pairs, stacked, compare(stacked)
+
+
+if __name__ == "__main__":
+    catalog, pairs, stacked, metrics = compare_all()
+
+    for row, i in enumerate(stacked["pair"]):
+        a, b = pairs["reference"][i], pairs["record"][i]
+        name = catalog[b].path.rsplit("/", 1)[-1]
+        unit = "dec" if stacked["setup"][row] in CURRENT_SETUPS else "V"
+        print(
+            f"{pairs['kind'][i]:13s} {name:48s} step {stacked['step'][row]:4.1f}  "
+            f"shift {metrics['shift'][row]:+6.2f} V  "
+            f"rms {metrics['rms'][row]:6.3f} {unit:3s}  "
+            f"ratio {metrics['log_ratio'][row]:+6.2f} dec  "
+            f"vs {catalog[a].path.rsplit('/', 1)[-1]}"
+        )
+
+    summary = summarize(catalog, pairs, stacked, metrics)
+    for i, (wafer, kind, setup) in enumerate(summary["group"]):
+        unit = "dec" if setup in CURRENT_SETUPS else "V"
+        print(
+            f"wafer {wafer} {kind:13s} {setup:8s} |shift| {summary['shift'][i]:5.2f} V  "
+            f"rms {summary['rms'][i]:6.3f} {unit:3s}  "
+            f"area {summary['area'][i]:6.3f} {unit}*V  "
+            f"|ratio| {summary['log_ratio'][i]:5.2f} dec  (n={summary['n'][i]})"
+        )
@@ -0,0 +1,321 @@
+from collections import defaultdict
+
+import numpy as np
+from scipy import stats
+
+from analysis.catalog import _REPEAT_TAGS, Catalog
+from analysis.circuit import SHEET_RESISTANCE
+from analysis.measurement import CACHE_DIR, load
+from analysis.transfer import _step_column, pad
+
+TLM_STRUCTURES = ("gated_tlm", "ito_on_w_tlm", "niau_on_ito_tlm")
+
+# Width of the TLM contact pads in um
+TLM_WIDTH = 100.0
+
+
+def group_key(record) -> tuple:
+    """Return the (wafer, anneal, structure, tags) TLM series of a record."""
+    tags = tuple(t for t in record.tags if t not in _REPEAT_TAGS)
+    return record.wafer, record.anneal, record.structure, tags
+
+
+def fit_line(x, y, confidence: float = 0.95) -> dict:
+    """Least squares fit of ``y = slope * x + intercept`` along the last axis.
+
+    NaN entries of ``x`` or ``y`` are ignored, so every row may use a different
+    number of points. Fits with fewer than three points give NaN errors.
+
+    Returns:
+        Mapping of arrays of the broadcast batch shape: ``slope``,
+        ``intercept``, their standard errors ``slope_se`` and ``intercept_se``,
+        their covariance ``cov``, the number of points ``n`` and the Student-t
+        quantile ``t`` of the two-sided ``confidence`` interval.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = np.where(mask, x, 0), np.where(mask, y, 0)
+
+    n = mask.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=-1) / n
+        y_mean = y.sum(axis=-1) / n
+        dx = np.where(mask, x - x_mean[..., None], 0)
+        dy = np.where(mask, y - y_mean[..., None], 0)
+        s_xx = (dx * dx).sum(axis=-1)
+        slope = (dx * dy).sum(axis=-1) / s_xx
+        intercept = y_mean - slope * x_mean
+
+        residual = np.where(mask, dy - slope[..., None] * dx, 0)
+        s2 = (residual**2).sum(axis=-1) / np.where(n > 2, n - 2, np.nan)
+        slope_se = np.sqrt(s2 / s_xx)
+        intercept_se = np.sqrt(s2 * (1 / n + x_mean**2 / s_xx))
+        cov = -x_mean * s2 / s_xx
+
+    dof = np.where(n > 2, n - 2, np.nan)
+    return {
+        "slope": slope,
+        "intercept": intercept,
+        "slope_se": slope_se,
+        "intercept_se": intercept_se,
+        "cov": cov,
+        "n": n,
+        "t": stats.t.ppf(0.5 + confidence / 2, dof),
+    }
+
+
+def _resistance(record, cache_dir, v_g, v_d):
+    """Return the total resistance of a TLM record at the gate biases ``v_g``.
+
+    Gated TLMs use the TRANSFER sweep at the drain step closest to ``v_d``,
+    ungated ones the slope of the RES sweep.
+    """
+    measurement = load(record.path, cache_dir)
+    if "TRANSFER" in measurement.setups:
+        block = measurement["TRANSFER"]
+        k = np.argmin(np.abs(block.sources["D"].values - v_d))
+        v = block.sources["D"].values[k]
+        order = np.argsort(block["VG"], kind="stable")  # np.interp needs rising x
+        i_d = np.interp(v_g, block["VG"][order], block[_step_column("ID", k)][order])
+        return np.divide(v, i_d, out=np.full(len(i_d), np.nan), where=i_d > 0)
+
+    block = measurement["RES"]
+    return np.full(len(v_g), fit_line(block["IK"], block["VK"])["slope"])
+
+
+def stack_tlm(records, cache_dir=CACHE_DIR, v_g=None, v_d: float = 0.5) -> dict:
+    """Group TLM records into series and stack their resistances.
+
+    Args:
+        records: Catalog records. Records that are not a TLM are skipped.
+        cache_dir: Measurement cache directory.
+        v_g: Gate biases at which gated TLMs are evaluated. Defaults to the
+            gate sweep of the first gated TLM.
+        v_d: Drain voltage of the TRANSFER step used for gated TLMs.
+
+    Returns:
+        Mapping with per series the ``group`` key (see `group_key`), the
+        ``record`` index into ``records`` of its first record, the ``length``
+        in um of shape (n_groups, n_lengths), the gate bias ``v_g`` of shape
+        (n_groups, n_biases) and the total resistance ``r`` in Ohm of shape
+        (n_groups, n_biases, n_lengths). Ungated series have a single NaN
+        bias. Everything is NaN padded.
+    """
+    groups = defaultdict(list)
+    first = {}
+    for i, record in enumerate(records):
+        if record.structure in TLM_STRUCTURES and record.length is not None:
+            groups[group_key(record)].append(record)
+            first.setdefault(group_key(record), i)
+
+    if v_g is None:
+        gated = next(
+            (r for rs in groups.values() for r in rs if "TRANSFER" in r.setups), None
+        )
+        v_g = load(gated.path, cache_dir)["TRANSFER"]["VG"] if gated else []
+    v_g = np.asarray(v_g, dtype=float)
+
+    keys = sorted(groups, key=str)
+    lengths, biases, resistances = [], [], []
+    for key in keys:
+        bias = v_g if key[2] == "gated_tlm" else np.array([np.nan])
+        lengths.append([r.length for r in groups[key]])
+        biases.append(bias)
+        resistances.append([_resistance(r, cache_dir, bias, v_d) for r in groups[key]])
+
+    length = pad(lengths)
+    r = np.full((len(keys), max(map(len, biases), default=0), length.shape[1]), np.nan)
+    for i, rows in enumerate(resistances):
+        r[i, : len(biases[i]), : len(rows)] = np.transpose(rows)
+
+    group = np.empty(len(keys), dtype=object)
+    group[:] = keys
+    return {
+        "group": group,
+        "record": np.array([first[key] for key in keys], dtype=int),
+        "length": length,
+        "v_g": pad(biases),
+        "r": r,
+    }
+
+
+def stack_res(records, cache_dir=CACHE_DIR) -> dict:
+    """Stack the RES sweeps of ``records``.
+
+    Args:
+        records: Catalog records. Records without a RES setup are skipped.
+        cache_dir: Measurement cache directory.
+
+    Returns:
+        Mapping with the swept voltage ``v`` and the current ``i`` of shape
+        (n, n_points), NaN padded, and per row the ``record`` index into
+        ``records`` and the structure ``length`` (NaN if unknown).
+    """
+    index, length, v, i_ = [], [], [], []
+    for i, record in enumerate(records):
+        if "RES" not in record.setups:
+            continue
+        block = load(record.path, cache_dir)["RES"]
+        sweep = next(s for s in block.sources.values() if s.mode == "SWEEP")
+        index.append(i)
+        length.append(np.nan if record.length is None else record.length)
+        v.append(block[f"V{sweep.id}"])
+        i_.append(block[f"I{sweep.id}"])
+    return {
+        "v": pad(v),
+        "i": pad(i_),
+        "record": np.array(index, dtype=int),
+        "length": np.array(length, dtype=float),
+    }
+
+
+def extract(tlm: dict, width: float = TLM_WIDTH, confidence: float = 0.95) -> dict:
+    """Fit ``R = R_sh * L / W + 2 * R_c`` for every series and gate bias.
+
+    Args:
+        tlm: Stacked series as returned by `stack_tlm`.
+        width: Width of the TLM structures in um.
+        confidence: Confidence level of the returned intervals.
+
+    Returns:
+        Mapping of arrays of shape (n_groups, n_biases): sheet resistance
+        ``r_sh`` (Ohm/sq), contact resistance ``r_c`` (Ohm), width-normalized
+        contact resistance ``r_c_w`` (Ohm um) and transfer length ``l_t`` (um).
+        Each comes with the half-width of its confidence interval as ``*_ci``.
+        ``n`` holds the number of lengths used in each fit.
+    """
+    fit = fit_line(tlm["length"][:, None, :], tlm["r"], confidence)
+    slope, intercept, t = fit["slope"], fit["intercept"], fit["t"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        l_t = intercept / (2 * slope)
+        # Delta method on l_t = intercept / (2 * slope)
+        l_t_se = np.abs(l_t) * np.sqrt(
+            (fit["intercept_se"] / intercept) ** 2
+            + (fit["slope_se"] / slope) ** 2
+            - 2 * fit["cov"] / (intercept * slope)
+        )
+
+    return {
+        "r_sh": slope * width,
+        "r_sh_ci": t * fit["slope_se"] * width,
+        "r_c": intercept / 2,
+        "r_c_ci": t * fit["intercept_se"] / 2,
+        "r_c_w": intercept / 2 * width,
+        "r_c_w_ci": t * fit["intercept_se"] / 2 * width,
+        "l_t": l_t,
+        "l_t_ci": t * l_t_se,
+        "n": fit["n"],
+    }
+
+
+def extract_all(catalog: Catalog | None = None, cache_dir=CACHE_DIR, **kwargs):
+    """Run the TLM analysis on every TLM series in the catalog.
+
+    Returns:
+        The stacked series and the extracted parameters, see `stack_tlm` and
+        `extract`.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    tlm = stack_tlm(catalog.query(latest=True), cache_dir)
+    return tlm, extract(tlm, **kwargs)
+
+
+## Resistor sizing
+
+
+def size_resistor_ito(target, r_sh=SHEET_RESISTANCE["ITO"], r_c_w=0.0, width=20):
+    """Return the `resistor_ito` ``length`` (squares) for a target resistance.
+
+    Accounts for the two contacts, whose width follows the trace width chosen
+    by `resistor_ito`.
+
+    Args:
+        target: Target resistance in Ohm.
+        r_sh: ITO sheet resistance in Ohm/sq.
+        r_c_w: Width-normalized contact resistance in Ohm um.
+        width: ``width`` argument of `resistor_ito`.
+    """
+    # length <= 1: trace_width = width
+    length = (target - 2 * r_c_w / width) / r_sh
+    if length > 1:
+        # trace_width = width / length, as long as it stays above 3um
+        length = target / (r_sh + 2 * r_c_w / width)
+        if width / length < 3:
+            length = (target - 2 * r_c_w / 3) / r_sh
+    if length <= 0:
+        raise ValueError(
+            f"Target {target:g} Ohm is below the contact resistance of "
+            f"{2 * r_c_w / width:g} Ohm"
+        )
+    return length
+
+
+def size_resistor(target, r_sh=SHEET_RESISTANCE["W"], r_c=0.0) -> int:
+    """Return the `resistor` ``length`` (meander squares) for a target resistance.
+
+    Args:
+        target: Target resistance in Ohm.
+        r_sh: Tungsten sheet resistance in Ohm/sq.
+        r_c: Resistance of each contact in Ohm.
+    """
+    length = round((target - 2 * r_c) / r_sh)
+    if length < 1:
+        raise ValueError(f"Target {target:g} Ohm is below a single square")
+    return length
+
+
+def physical(params: dict) -> np.ndarray:
+    """Return which fits have a positive sheet and non-negative contact resistance."""
+    with np.errstate(invalid="ignore"):
+        return (params["r_sh"] > 0) & (params["r_c"] >= 0)
+
+
+if __name__ == "__main__":
+    tlm, params = extract_all()
+    valid = physical(params)
+
+    for i, (wafer, anneal, structure, tags) in enumerate(tlm["group"]):
+        name = f"wafer {wafer} {structure} {'_'.join(tags)}"
+        for j, v_g in enumerate(tlm["v_g"][i]):
+            if params["n"][i, j] < 3 or structure == "gated_tlm" and v_g % 2:
+                continue
+            print(
+                f"{name:40s} VG {v_g:+4.1f}  "
+                f"R_sh {params['r_sh'][i, j]:9.3g} +- {params['r_sh_ci'][i, j]:8.2g}  "
+                f"R_c W {params['r_c_w'][i, j]:9.3g} +- {params['r_c_w_ci'][i, j]:8.2g}  "
+                f"L_T {params['l_t'][i, j]:8.3g} +- {params['l_t_ci'][i, j]:8.2g} um"
+                + ("" if valid[i, j] else "  nonphysical")
+            )
+
+    # Size the load resistors from the first physical ungated ITO fit. No
+    # tungsten TLM is measured, so the meander uses the nominal W sheet.
+    rows = [
+        i
+        for i, g in enumerate(tlm["group"])
+        if g[2] == "ito_on_w_tlm" and valid[i, 0] and params["n"][i, 0] >= 3
+    ]
+    if rows:
+        r_sh_ito, r_c_w_ito = params["r_sh"][rows[0], 0], params["r_c_w"][rows[0], 0]
+        print(f"ITO R_sh {r_sh_ito:.3g} Ohm/sq, R_c W {r_c_w_ito:.3g} Ohm um (fitted)")
+    else:
+        r_sh_ito, r_c_w_ito = SHEET_RESISTANCE["ITO"], 0.0
+        print(f"ITO R_sh {r_sh_ito:.3g} Ohm/sq (nominal)")
+    r_sh_w = SHEET_RESISTANCE["W"]
+    print(f"W R_sh {r_sh_w:.3g} Ohm/sq (nominal)")
+
+    for target in (1e6, 1e7, 1e8, 1e9):
+        sizes, errors = [], []
+        for name, size in (
+            ("resistor_ito", lambda: size_resistor_ito(target, r_sh_ito, r_c_w_ito)),
+            ("resistor", lambda: size_resistor(target, r_sh_w)),
+        ):
+            try:
+                length = size()
+                length = str(length) if isinstance(length, int) else f"{length:.3g}"
+                sizes.append(f"{name}(length={length})")
+            except ValueError as e:
+                errors.append(f"{name}: {e}")
+        print(f"{target:8.0e} Ohm: {', '.join(sizes) or '-'}")
+        for error in errors:
+            print(f"{'':14s}{error}")
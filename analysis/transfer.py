@@ -0,0 +1,148 @@
+import numpy as np
+
+from analysis.catalog import Catalog
+from analysis.circuit import gate_capacitance
+from analysis.measurement import CACHE_DIR, load
+
+
+def _step_column(name: str, k: int) -> str:
+    """Return the data column of ``name`` at step ``k`` (ID, ID2, ID3, ...)."""
+    return name if k == 0 else f"{name}{k + 1}"
+
+
+def pad(rows, fill=np.nan) -> np.ndarray:
+    """Stack 1D arrays of different lengths into a (n, max_len) array."""
+    out = np.full((len(rows), max((len(r) for r in rows), default=0)), fill)
+    for i, row in enumerate(rows):
+        out[i, : len(row)] = row
+    return out
+
+
+def stack_transfer(records, cache_dir=CACHE_DIR) -> dict:
+    """Stack the TRANSFER curves of ``records`` into padded arrays.
+
+    Every drain voltage step of a file becomes one row.
+
+    Returns:
+        Mapping with ``vg`` and ``i_d`` of shape (n, n_points), NaN padded, and
+        per row the source ``path``, its ``record`` index into ``records``,
+        ``vd`` and the channel ``w`` and ``l`` in um (NaN if unknown).
+    """
+    path, index, vd, vg, i_d, w, l = [], [], [], [], [], [], []
+    for i, record in enumerate(records):
+        if "TRANSFER" not in record.setups:
+            continue
+        block = load(record.path, cache_dir)["TRANSFER"]
+        for k, v in enumerate(block.sources["D"].values):
+            path.append(record.path)
+            index.append(i)
+            vd.append(v)
+            vg.append(block["VG"])
+            i_d.append(block[_step_column("ID", k)])
+            w.append(record.w_mesa if record.w_mesa is not None else np.nan)
+            l.append(record.l_gate if record.l_gate is not None else np.nan)
+
+    return {
+        "path": np.array(path, dtype=object),
+        "record": np.array(index, dtype=int),
+        "vd": np.array(vd, dtype=float),
+        "vg": pad(vg),
+        "i_d": pad(i_d),
+        "w": np.array(w, dtype=float),
+        "l": np.array(l, dtype=float),
+    }
+
+
+def _argmax(x: np.ndarray) -> np.ndarray:
+    """Row-wise argmax ignoring NaN (all-NaN rows give 0)."""
+    return np.argmax(np.where(np.isnan(x), -np.inf, x), axis=1)
+
+
+def extract(curves: dict, i_floor: float = 1e-10, v_lin: float = 1.0) -> dict:
+    """Extract TFT figures of merit from stacked transfer curves.
+
+    Curves with ``vd < v_lin`` are evaluated in the linear regime (maximum
+    transconductance extrapolation), all others in saturation (maximum slope
+    of sqrt(I_D)).
+
+    Args:
+        curves: Stacked curves as returned by `stack_transfer`.
+        i_floor: Current noise floor in A. Currents below are ignored for the
+            subthreshold swing and clip the off current.
+        v_lin: Drain voltage below which a curve counts as linear regime.
+
+    Returns:
+        Mapping of per-curve arrays: ``v_th`` (V), ``ss`` (V/dec), ``i_on``,
+        ``i_off`` (A), ``on_off``, ``gm_max`` (S) and ``mobility`` (cm^2/Vs).
+    """
+    vg, i_d, vd = curves["vg"], curves["i_d"], curves["vd"]
+    rows = np.arange(len(vd))
+    linear = vd < v_lin
+
+    dvg = np.diff(vg, axis=1)
+    vg_mid = (vg[:, 1:] + vg[:, :-1]) / 2
+
+    # Linear regime: extrapolate the tangent at maximum transconductance
+    gm = np.diff(i_d, axis=1) / dvg
+    k = _argmax(gm)
+    gm_max = gm[rows, k]
+    i_mid = (i_d[rows, k] + i_d[rows, k + 1]) / 2
+    v_th_lin = vg_mid[rows, k] - i_mid / gm_max - vd / 2
+
+    # Saturation: extrapolate the tangent of sqrt(I_D)
+    sqrt_i = np.sqrt(np.clip(i_d, 0, None))
+    slope = np.diff(sqrt_i, axis=1) / dvg
+    k = _argmax(slope)
+    slope_max = slope[rows, k]
+    sqrt_mid = (sqrt_i[rows, k] + sqrt_i[rows, k + 1]) / 2
+    v_th_sat = vg_mid[rows, k] - sqrt_mid / slope_max
+
+    # Subthreshold swing from the steepest decade above the noise floor. NaN
+    # for curves without a rising pair of points above the floor.
+    log_i = np.log10(np.where(i_d > i_floor, i_d, np.nan))
+    steepest = np.nanmax(np.diff(log_i, axis=1) / dvg, axis=1, initial=0)
+    ss = np.divide(1, steepest, out=np.full(len(vd), np.nan), where=steepest > 0)
+
+    abs_i = np.abs(i_d)
+    i_on = np.nanmax(abs_i, axis=1)
+    i_off = np.maximum(np.nanmin(abs_i, axis=1), i_floor)
+
+    c_ox = gate_capacitance()
+    w_l = curves["w"] / curves["l"]
+    mobility_lin = gm_max / (w_l * c_ox * vd)
+    mobility_sat = 2 * slope_max**2 / (w_l * c_ox)
+
+    return {
+        "v_th": np.where(linear, v_th_lin, v_th_sat),
+        "ss": ss,
+        "i_on": i_on,
+        "i_off": i_off,
+        "on_off": i_on / i_off,
+        "gm_max": gm_max,
+        "mobility": np.where(linear, mobility_lin, mobility_sat) * 1e4,
+    }
+
+
+def extract_all(catalog: Catalog | None = None, cache_dir=CACHE_DIR, **kwargs):
+    """Extract the figures of merit of every transfer curve in the catalog.
+
+    Returns:
+        The stacked curves and the extracted parameters, see `stack_transfer`
+        and `extract`.
+    """
+    catalog = catalog if catalog is not None else Catalog.build(cache_dir=cache_dir)
+    curves = stack_transfer(catalog, cache_dir)
+    return curves, extract(curves, **kwargs)
+
+
+if __name__ == "__main__":
+    curves, params = extract_all()
+
+    for i, path in enumerate(curves["path"]):
+        print(
+            f"{path.rsplit('/', 1)[-1]:45s} VD {curves['vd'][i]:3.1f} "
+            f"Vth {params['v_th'][i]:+5.2f} V  "
+            f"SS {params['ss'][i] * 1e3:5.0f} mV/dec  "
+            f"on/off {params['on_off'][i]:8.1e}  "
+            f"mu {params['mobility'][i]:6.2f} cm2/Vs"
+        )
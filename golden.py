@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import gdsfactory as gf
+import klayout.db as kdb
+
+import main
+from pdk.bulk import text_region
+from pdk.components import resistance_meander, resistor, resistor_ito, transistor
+
+GOLDEN_PATH = Path(__file__).parent / "golden.json"
+
+# Parameter grid of every generator. Kept small enough to build in well under
+# a minute, but covering every branch of the generators.
+GRID = {
+    "resistance_meander": [
+        dict(num_squares=n, width=w, res_layer="W_GATE", pad_layer="W_GATE")
+        for n in (100, 1000, 10000)
+        for w in (1, 2)
+    ],
+    "resistor": [dict(length=l) for l in main.R_VARIANTS_W],
+    "resistor_ito": [dict(length=l, width=w) for l in (0.05, 1, 5) for w in (20, 50)],
+    "transistor": [
+        dict(
+            l_mesa=main.compute_l_mesa(l_g, l_ov), l_gate=l_g, l_overlap=l_ov, w_mesa=w
+        )
+        for l_g, l_ov, w in [(5, 2, 10), (20, 10, 100), (40, 20, 50)]
+    ],
+    "padded_transistor": [
+        dict(l_gate=l_g, l_overlap=l_ov, w_mesa=w, wire_width=50, h_separation=3)
+        for l_g, l_ov, w in [(5, 2, 10), (20, 10, 100), (40, 5, 50)]
+    ],
+    "full_adder": [
+        dict(l_gate=5, l_overlap=2, w_mesa=10),
+        dict(l_gate=20, l_overlap=10, w_mesa=100),
+        dict(l_gate=40, l_overlap=20, w_mesa=100),
+        dict(l_gate=10, l_overlap=5, w_mesa=20, r_type=("W", 500)),
+        dict(l_gate=10, l_overlap=5, w_mesa=20, r_type=("ITO", 0.05)),
+        dict(l_gate=40, l_overlap=10, w_mesa=100, r_type=("ITO", 0.2)),
+        dict(l_gate=5, l_overlap=5, w_mesa=50, split_vdd=True),
+        dict(disabled=("m_0", "m_5")),
+    ],
+    "transistor_test": [
+        dict(l_gate=l_g, l_overlap=l_ov, w_mesa=w)
+        for l_g, l_ov, w in [(5, 2, 10), (20, 10, 100), (40, 20, 50)]
+    ],
+    "resistor_w_test": [dict(length=l) for l in (100, 10000)],
+    "resistor_ito_test": [dict(length=l) for l in (0.05, 5)],
+    "inverter_test": [
+        dict(l_gate=l_g, l_overlap=l_ov, w_mesa=w, n_transistors=n)
+        for l_g, l_ov, w in [(5, 2, 10), (40, 10, 100)]
+        for n in (1, 2)
+    ],
+}
+
+# Labels drawn by `pdk.bulk.add_text`, as (text, size)
+TEXTS = [
+    ("Lg 5\nOv 2\nWm 10\n", 10),
+    ("Lg 40\nOv 20\nWm 100\n", 10),
+    ("R W 10000", 10),
+    ("R ITO 0.05\nW 50", 15),
+]
+
+GENERATORS = {
+    "resistance_meander": resistance_meander,
+    "resistor": resistor,
+    "resistor_ito": resistor_ito,
+    "transistor": transistor,
+    "padded_transistor": main.padded_transistor,
+    "full_adder": main.full_adder,
+    "transistor_test": main.transistor_test,
+    "resistor_w_test": main.resistor_w_test,
+    "resistor_ito_test": main.resistor_ito_test,
+    "inverter_test": main.inverter_test,
+}
+
+
+def fingerprint(c: gf.Component) -> dict:
+    """Return a compact, hierarchy independent fingerprint of ``c``.
+
+    Every layer is flattened and merged, so only the drawn geometry counts, not
+    how it is split into cells, references or polygons.
+
+    Returns:
+        Mapping with the ``bbox`` in um, the sorted ``ports`` with positions
+        and widths in dbu and per layer the ``area`` in dbu^2, the merged
+        polygon count and a hash of the merged polygons.
+    """
+    layers = {}
+    for index in c.kcl.layer_indexes():
+        region = kdb.Region(c.begin_shapes_rec(index)).merged()
+        if region.is_empty():
+            continue
+        info = c.kcl.get_info(index)
+        polygons = sorted(str(p) for p in region.each())
+        layers[f"{info.layer}/{info.datatype}"] = {
+            "hash": hashlib.sha1("\n".join(polygons).encode()).hexdigest()[:16],
+            "area": region.area(),
+            "polygons": len(polygons),
+        }
+
+    bbox = c.bbox()
+    ports = sorted(
+        [p.name, p.trans.disp.x, p.trans.disp.y, p.trans.angle * 90, p.width]
+        + [p.layer_info.layer, p.layer_info.datatype]
+        for p in c.ports
+    )
+    return {
+        "bbox": [bbox.left, bbox.bottom, bbox.right, bbox.top],
+        "ports": ports,
+        "layers": layers,
+    }
+
+
+def check_text(texts=TEXTS):
+    """Check that `pdk.bulk` draws labels exactly like `gf.components.text`.
+
+    Raises:
+        AssertionError: If the polygons of a label differ.
+    """
+    layer = (0, 0)
+    for text, size in texts:
+        c = gf.components.text(text, size, layer=layer)
+        expected = kdb.Region(c.begin_shapes_rec(gf.get_layer(layer))).merged()
+        if not (text_region(text, size).merged() ^ expected).is_empty():
+            raise AssertionError(f"label {text!r} differs from gf.components.text")
+
+
+def cell_key(name: str, kwargs: dict) -> str:
+    args = ", ".join(f"{k}={v!r}" for k, v in kwargs.items())
+    return f"{name}({args})"
+
+
+def diff(expected: dict, actual: dict) -> list[str]:
+    """Describe how fingerprint ``actual`` differs from ``expected``."""
+    changes = []
+    if expected["bbox"] != actual["bbox"]:
+        changes.append(f"bbox {expected['bbox']} -> {actual['bbox']}")
+    if expected["ports"] != actual["ports"]:
+        changes.append(f"ports {expected['ports']} -> {actual['ports']}")
+    for layer in sorted(set(expected["layers"]) | set(actual["layers"])):
+        e = expected["layers"].get(layer)
+        a = actual["layers"].get(layer)
+        if e != a:
+            e_area = e["area"] if e else 0
+            a_area = a["area"] if a else 0
+            changes.append(f"layer {layer} changed, area {e_area} -> {a_area}")
+    return changes
+
+
+def run(golden: dict | None = None, generators=GENERATORS) -> dict:
+    """Build the parameter grid and compare it to ``golden``.
+
+    Stops at the first cell whose fingerprint differs.
+
+    Returns:
+        Mapping with the fingerprint of every ``cell`` and the build ``time``
+        of every generator in s.
+
+    Raises:
+        AssertionError: If a cell does not match its golden fingerprint.
+    """
+    result = {"cells": {}, "time": {}}
+    for name, func in generators.items():
+        result["time"][name] = 0.0
+        for kwargs in GRID[name]:
+            key = cell_key(name, kwargs)
+            start = time.perf_counter()
+            c = func(**kwargs)
+            result["time"][name] += time.perf_counter() - start
+            fp = fingerprint(c)
+            result["cells"][key] = fp
+            if golden is None:
+                continue
+            expected = golden["cells"].get(key)
+            if expected is None:
+                raise AssertionError(f"{key}: no golden fingerprint, run --update")
+            changes = diff(expected, fp)
+            if changes:
+                raise AssertionError(f"{key}:\n  " + "\n  ".join(changes))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the generators against their golden geometry."
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="rewrite the golden fingerprints"
+    )
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH)
+    args = parser.parse_args()
+
+    golden = None if args.update else json.loads(args.golden.read_text())
+    start = time.perf_counter()
+    try:
+        check_text()
+        result = run(golden)
+    except AssertionError as e:
+        print(f"Geometry changed: {e}")
+        sys.exit(1)
+
+    for name, t in result["time"].items():
+        line = f"{name:20s} {len(GRID[name]):3d} cells {t:7.3f} s"
+        if golden is not None and name in golden["time"]:
+            line += f"  ({t / golden['time'][name]:5.2f}x golden)"
+        print(line)
+    print(f"Total {time.perf_counter() - start:.1f} s")
+
+    if args.update:
+        args.golden.write_text(json.dumps(result, indent=1) + "\n")
+        print(f"Wrote {args.golden}")
+    else:
+        print("All cells match")
@@ -1,5 +1,7 @@
+import argparse
 import itertools
 from functools import partial
+from types import SimpleNamespace
 
 import gdsfactory as gf
 import kfactory
@@ -10,17 +12,27 @@ from gdsfactory.cross_section import (
 )
 
 import pdk.cross_section
-from pdk import PDK
+from pdk import PDK, bulk
+from pdk.bulk import add_text
 from pdk.components import *
+from pdk.concurrency import cell
+from pdk.floorplan import Floorplan
+from pdk.memory import MemoryProfile
+from pdk.routing import route_cached
+from pdk.stepping import die_map, step
 
 PDK.activate()
 
+# Grid cell of one transistor in `full_adder`, the width of the wires routed
+# through it and the separations kept around the transistor
+GRID_W = 160
+GRID_H = 173
+WIRE_WIDTH = 50
+SEPARATION = 0
+H_SEPARATION = 3
 
-def compute_l_mesa(l_gate: float, l_overlap: float):
-    return l_overlap * 2 + l_gate - 1
 
-
-@gf.cell
+@cell
 def padded_transistor(
     l_gate: float,
     l_overlap: float,
@@ -102,7 +114,31 @@ def padded_transistor(
     return c
 
 
-@gf.cell
+@cell
+def without_ito(component):
+    """Return a copy of ``component`` without its ITO channel."""
+    c = gf.Component(component.name + "_dis")
+    c.kdb_cell.copy_tree(component.kdb_cell)
+    c.add_ports(component.ports)
+    c.remove_layers([LAYER.ITO_CHANNEL])
+    return c
+
+
+def fits_grid(transistor) -> bool:
+    """Return whether a padded transistor leaves room to route its grid cell.
+
+    `full_adder` variants whose transistors do not fit are marked invalid.
+    """
+    return (
+        GRID_H - transistor.bbox().height() - 2 * SEPARATION
+        >= 2 * WIRE_WIDTH + H_SEPARATION
+    ) and (
+        GRID_W - transistor.bbox().width() - 2 * SEPARATION
+        >= WIRE_WIDTH + 2 * H_SEPARATION
+    )
+
+
+@cell
 def full_adder(
     l_gate=30,
     l_overlap=5,
@@ -113,12 +149,12 @@ def full_adder(
 ):
     disabled = disabled or []
 
-    grid_w = 160
-    grid_h = 173
-    wire_width = 50
+    grid_w = GRID_W
+    grid_h = GRID_H
+    wire_width = WIRE_WIDTH
 
-    separation = 0
-    h_separation = 3
+    separation = SEPARATION
+    h_separation = H_SEPARATION
     metal_routing_ni = partial(pdk.cross_section.metal_routing_ni, width=wire_width)
     metal_routing_w = partial(pdk.cross_section.metal_routing_w, width=wire_width)
 
@@ -129,14 +165,6 @@ def full_adder(
 
     t_proto = padded_transistor(l_gate, l_overlap, w_mesa, wire_width, h_separation)
 
-    @gf.cell
-    def without_ito(component):
-        c = gf.Component(component.name + "_dis")
-        c.kdb_cell.copy_tree(component.kdb_cell)
-        c.add_ports(component.ports)
-        c.remove_layers([LAYER.ITO_CHANNEL])
-        return c
-
     def get_transistor(name: str):
         if name in disabled:
             return without_ito(t_proto)
@@ -159,16 +187,13 @@ def full_adder(
         if width is not None:
             cross_section = partial(cross_section, width=width)
 
-        gf.routing.route_single(
+        route_cached(
             c,
             port_1,
             port_2,
+            cross_section=cross_section,
             start_straight_length=start_straight_length,
             end_straight_length=end_straight_length,
-            cross_section=cross_section,
-            bend=gf.components.wire_corner,
-            port_type="electrical",
-            allow_width_mismatch=True,
             **kwargs,
         )
 
@@ -184,16 +209,13 @@ def full_adder(
         if width is not None:
             cross_section = partial(cross_section, width=width)
 
-        gf.routing.route_single(
+        route_cached(
             c,
             port_1,
             port_2,
+            cross_section=cross_section,
             start_straight_length=start_straight_length,
             end_straight_length=end_straight_length,
-            cross_section=cross_section,
-            bend=gf.components.wire_corner,
-            port_type="electrical",
-            allow_width_mismatch=True,
             **kwargs,
         )
 
@@ -332,9 +354,9 @@ def full_adder(
     # Input Routing #
     #################
 
-    a_in = c << via((100, 100))
-    b_in = c << via((100, 100))
-    c_in = c << via((100, 100))
+    a_in = c.add_ref(via((100, 100)), name="a")
+    b_in = c.add_ref(via((100, 100)), name="b")
+    c_in = c.add_ref(via((100, 100)), name="c_in")
 
     a_in.center = grid_pos(-0.5, -0.5)
     b_in.center = grid_pos(-0.5, -1.5)
@@ -404,18 +426,22 @@ def full_adder(
     #############
 
     if split_vdd:
-        for res in [r_0, r_1, r_2, r_3]:
-            vdd = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+        for i, res in enumerate([r_0, r_1, r_2, r_3]):
+            vdd = c.add_ref(
+                gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS), name=f"vdd{i}"
+            )
             vdd.connect("e4", res, "top_e1", allow_width_mismatch=True)
 
     else:
-        vdd = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+        vdd = c.add_ref(
+            gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS), name="vdd"
+        )
 
         vdd.center = grid_pos(7, 1.5)
         vdd.x += 20
         route_ni(vdd.ports["e2"], r_2.ports["top_e1"])
 
-    gnd = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    gnd = c.add_ref(gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS), name="gnd")
 
     gnd.center = grid_pos(7, 0)
     gnd.ymax = m_1.ymin
@@ -431,8 +457,8 @@ def full_adder(
     # Outputs #
     ###########
 
-    s_out = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    c_out = c << via((100, 100))
+    s_out = c.add_ref(gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS), name="s")
+    c_out = c.add_ref(via((100, 100)), name="c_out")
 
     s_out.center = grid_pos(7, 0)
     s_out.x += 20
@@ -453,11 +479,7 @@ def full_adder(
 
     ### Quick Design Check
 
-    if (
-        (grid_h - m_0.bbox().height() - 2 * separation) < 2 * wire_width + h_separation
-    ) or (
-        (grid_w - m_0.bbox().width() - 2 * separation) < wire_width + 2 * h_separation
-    ):
+    if not fits_grid(m_0):
         old_c = c
         c = gf.Component()
         boundary = c << gf.components.rectangle(
@@ -490,7 +512,52 @@ def full_adder(
 ## Test Patterns
 
 
-@gf.cell
+def draw_transistor_test(c, l_gate, l_overlap, w_mesa):
+    """Draw a `transistor_test` into the empty component ``c``.
+
+    All positions follow from the bboxes of the shared cells, queried before
+    anything is added. A bbox query after a change updates the bboxes of the
+    whole layout, which would dominate the build time of a full mask.
+    """
+    l_mesa = compute_l_mesa(l_gate, l_overlap)
+    t = transistor(l_mesa, l_gate, l_overlap, w_mesa)
+    pad = gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    v = via((100, 100))
+    box, pad_box, via_box = t.dbbox(), pad.dbbox(), v.dbbox()
+
+    # Gate lead, a straight up from the gate port, with the gate via on top
+    x, y = t.ports["g1"].center
+    width = box.width() - 7
+    via_x = x - v.ports["bot_e4"].center[0]
+    via_y = y + 6 - v.ports["bot_e4"].center[1]
+
+    c << t
+    c.add_polygon(
+        [
+            (x - width / 2, y),
+            (x + width / 2, y),
+            (x + width / 2, y + 6),
+            (x - width / 2, y + 6),
+        ],
+        layer=LAYER.W_GATE,
+    )
+    c.add_ref(v, name="g").move((via_x, via_y))
+
+    pad_y = box.top - 4 - pad_box.top
+    c.add_ref(pad, name="s").move((box.left - pad_box.right, pad_y))
+    c.add_ref(pad, name="d").move((box.right - pad_box.left, pad_y))
+
+    add_text(
+        c,
+        f"Lg {l_gate}\n" + f"Ov {l_overlap}\n" + f"Wm {w_mesa}\n",
+        10,
+        [LAYER.W_GATE, LAYER.NI_CONTACTS],
+        xmin=via_x + via_box.right + 5,
+        ymax=via_y + via_box.top - 5,
+    )
+
+
+@cell
 def transistor_test(
     l_gate=30,
     l_overlap=5,
@@ -499,203 +566,252 @@ def transistor_test(
     """
     Transistor test structure
     """
-    l_mesa = compute_l_mesa(l_gate, l_overlap)
-
     c = gf.Component()
-    t = c << transistor(l_mesa, l_gate, l_overlap, w_mesa)
-
-    p_s = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_d = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_g = c << via((100, 100))
-    s_g = c << gf.components.straight(
-        6, cross_section=metal_routing_w(width=t.bbox().width() - 7)
-    )
-
-    s_g.connect("e1", t, "g1", allow_width_mismatch=True)
-    p_g.connect("bot_e4", s_g, "e2", allow_width_mismatch=True)
-
-    p_s.xmax = t.xmin
-    p_s.ymax = t.ymax - 4
-
-    p_d.xmin = t.xmax
-    p_d.ymax = t.ymax - 4
-
-    for layer in [LAYER.W_GATE, LAYER.NI_CONTACTS]:
-        text = c << gf.components.text(
-            text=f"Lg {l_gate}\n" + f"Ov {l_overlap}\n" + f"Wm {w_mesa}\n",
-            size=10,
-            layer=layer,
-        )
-
-        text.xmin = p_g.xmax + 5
-        text.ymax = p_g.ymax - 5
-
+    draw_transistor_test(c, l_gate, l_overlap, w_mesa)
     return c
 
 
-@gf.cell
-def resistor_w_test(length=100):
-    c = gf.Component()
-    r = c << resistor(length=length, width=int(np.sqrt(length) * 3))
+def draw_resistor_test(c, r, label):
+    """Draw pads and a ``label`` onto the resistor ``r`` in ``c``."""
+    r = c << r
 
-    p_1 = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_2 = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    pad = gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    p_1 = c.add_ref(pad, name="p1")
+    p_2 = c.add_ref(pad, name="p2")
 
     p_1.connect("e1", r, "top_e1", allow_width_mismatch=True)
     p_2.connect("e1", r, "top_e2", allow_width_mismatch=True)
 
-    for layer in [LAYER.W_GATE, LAYER.NI_CONTACTS]:
-        text = c << gf.components.text(
-            text=f"W\nL {length}",
-            size=10,
-            layer=layer,
-        )
+    add_text(
+        c,
+        label,
+        10,
+        [LAYER.W_GATE, LAYER.NI_CONTACTS],
+        xmin=p_1.xmin + 5,
+        ymin=p_1.ymax + 5,
+    )
 
-        text.xmin = p_1.xmin + 5
-        text.ymin = p_1.ymax + 5
 
-    return c
+def draw_resistor_w_test(c, length):
+    """Draw a `resistor_w_test` into the empty component ``c``."""
+    r = resistor(length=length, width=int(np.sqrt(length) * 3))
+    draw_resistor_test(c, r, f"W\nL {length}")
 
 
-@gf.cell
-def resistor_ito_test(length=10):
+@cell
+def resistor_w_test(length=100):
     c = gf.Component()
-    r = c << resistor_ito(length=length, width=100)
-
-    p_1 = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_2 = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    draw_resistor_w_test(c, length)
+    return c
 
-    p_1.connect("e1", r, "top_e1", allow_width_mismatch=True)
-    p_2.connect("e1", r, "top_e2", allow_width_mismatch=True)
 
-    for layer in [LAYER.W_GATE, LAYER.NI_CONTACTS]:
-        text = c << gf.components.text(
-            text=f"ITO\nL {length}",
-            size=10,
-            layer=layer,
-        )
+def draw_resistor_ito_test(c, length):
+    """Draw a `resistor_ito_test` into the empty component ``c``."""
+    draw_resistor_test(c, resistor_ito(length=length, width=100), f"ITO\nL {length}")
 
-        text.xmin = p_1.xmin + 5
-        text.ymin = p_1.ymax + 5
 
+@cell
+def resistor_ito_test(length=10):
+    c = gf.Component()
+    draw_resistor_ito_test(c, length)
     return c
 
 
-@gf.cell
-def inverter_test(l_gate=30, l_overlap=5, w_mesa=100, n_transistors=1):
-    c = gf.Component()
+def draw_inverter_test(c, l_gate, l_overlap, w_mesa, n_transistors):
+    """Draw an `inverter_test` into the empty component ``c``."""
     r = c << resistor(5000, width=300)
     r.rotate(90)
 
     prev_cell = r
     prev_port_name = "top_e1"
-    for _ in range(n_transistors):
+    for i in range(n_transistors):
         t = c << padded_transistor(l_gate, l_overlap, w_mesa, 100, 5)
         t.connect("s", prev_cell, prev_port_name, allow_width_mismatch=True)
 
-        p_g = c << via((100, 100))
+        p_g = c.add_ref(via((100, 100)), name=f"in{i}")
         p_g.connect("bot_e3", t, "g2", allow_width_mismatch=True)
 
         prev_cell = t
         prev_port_name = "d"
 
-    p_v = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_s = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
-    p_d = c << gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    pad = gf.components.pad((100, 100), layer=LAYER.NI_CONTACTS)
+    p_v = c.add_ref(pad, name="vdd")
+    p_s = c.add_ref(pad, name="out")
+    p_d = c.add_ref(pad, name="gnd")
 
     p_v.connect("e4", r, "top_e2", allow_width_mismatch=True)
     p_d.connect("e2", prev_cell, prev_port_name, allow_width_mismatch=True)
 
     p_s.connect("e1", r, "top_e1", allow_width_mismatch=True, allow_layer_mismatch=True)
-    p_s.xmin = prev_cell.xmax + 5
 
-    for layer in [LAYER.W_GATE, LAYER.NI_CONTACTS]:
-        text = c << gf.components.text(
-            text=f"Lg {l_gate}\n" + f"Ov {l_overlap}\n" + f"Wm {w_mesa}\n",
-            size=10,
-            layer=layer,
-        )
+    # Query all bboxes before the next change, see `draw_transistor_test`
+    dx = prev_cell.xmax + 5 - p_s.xmin
+    text_x, text_y = p_v.xmax + 5, p_v.ymax - 5
+    p_s.movex(dx)
+
+    add_text(
+        c,
+        f"Lg {l_gate}\n" + f"Ov {l_overlap}\n" + f"Wm {w_mesa}\n",
+        10,
+        [LAYER.W_GATE, LAYER.NI_CONTACTS],
+        xmin=text_x,
+        ymax=text_y,
+    )
 
-        text.xmin = p_v.xmax + 5
-        text.ymax = p_v.ymax - 5
 
+@cell
+def inverter_test(l_gate=30, l_overlap=5, w_mesa=100, n_transistors=1):
+    c = gf.Component()
+    draw_inverter_test(c, l_gate, l_overlap, w_mesa, n_transistors)
     return c
 
 
-def main():
+# Layout variants of the test structures
+
+T_VARIANTS = list(
+    itertools.product(
+        [5, 10, 20, 40],  # l_g
+        [2, 5, 10, 20],  # l_ov
+        [10, 20, 50, 100],  # w
+    )
+)
+
+R_FULL_ADDER_VARIANTS = list(
+    itertools.product(
+        [5, 10, 20, 40],  # l_g
+        [5, 10],  # l_ov
+        [20, 100],  # w
+        [("W", 500), ("ITO", 0.05), ("ITO", 0.1), ("ITO", 0.2)],  # r_type
+    )
+)
+
+VDD_FULL_ADDER_VARIANTS = list(
+    itertools.product(
+        [5, 10, 20, 40],  # l_g
+        [5, 10],  # l_ov
+        [50, 100],  # w
+    )
+)
+
+R_VARIANTS_W = [100, 200, 500, 1000, 2000, 5000, 10000]
+R_VARIANTS_ITO = [0.05, 0.1, 0.2, 0.5, 1, 2, 5]
+
+
+def main(
+    plan: bool = False,
+    wafer: float | None = None,
+    profile_memory: bool = False,
+    memory_budget: float | None = None,
+    floorplan: bool = False,
+    manifest: bool = False,
+):
+    """Build the full mask and write it to ``full_adder.gds``.
+
+    Args:
+        plan: Choose the transistor and resistor-load full adder variants from
+            the measurement data (see `analysis.plan`) instead of using
+            `T_VARIANTS` and `R_FULL_ADDER_VARIANTS`.
+        wafer: Step the blocks over a full wafer of this diameter in um
+            instead of the 3x3 dies of a single reticle.
+        profile_memory: Trace the allocations of every build stage and print a
+            memory report at the end.
+        memory_budget: Stop the build once its RSS exceeds this many MB.
+        floorplan: Only place the bounding boxes of the test structures (see
+            `pdk.floorplan.Floorplan`) and write them to
+            ``full_adder_floorplan.gds``.
+        manifest: Also write the pad coordinates of every device in probing
+            order to ``full_adder_probes.csv`` (see `analysis.manifest`).
+    """
+    memory = MemoryProfile(trace=profile_memory, budget=memory_budget)
     c = gf.Component()
 
-    t_variants = list(
-        itertools.product(
-            [5, 10, 20, 40],  # l_g
-            [2, 5, 10, 20],  # l_ov
-            [10, 20, 50, 100],  # w
+    generators = [
+        full_adder,
+        transistor_test,
+        resistor_w_test,
+        resistor_ito_test,
+        inverter_test,
+    ]
+    if floorplan:
+        boxes = Floorplan(generators)
+        generators = [boxes(func) for func in generators]
+    cells = SimpleNamespace(**{func.__name__: func for func in generators})
+
+    t_variants = T_VARIANTS
+    r_full_adder_variants = R_FULL_ADDER_VARIANTS
+    if plan:
+        from analysis.plan import plan_variants
+
+        t_variants, r_full_adder_variants = plan_variants(
+            T_VARIANTS, R_FULL_ADDER_VARIANTS
         )
-    )
 
     # Full Adder
     full_adders = [
-        full_adder(l_gate, l_overlap, w_mesa)
+        cells.full_adder(l_gate, l_overlap, w_mesa)
         for (l_gate, l_overlap, w_mesa) in t_variants
     ]
     full_adders = [x for x in full_adders if "invalid" not in x.info]
     full_adder_test_structure = gf.grid(
         full_adders, shape=(len(full_adders), 6), spacing=(20, 10)
     )
+    memory.checkpoint("full adders")
 
     # Full Adder - Resistor
-    r_full_adder_variants = list(
-        itertools.product(
-            [5, 10, 20, 40],  # l_g
-            [5, 10],  # l_ov
-            [20, 100],  # w
-            [("W", 500), ("ITO", 0.05), ("ITO", 0.1), ("ITO", 0.2)],  # r_type
-        )
-    )
-
     r_full_adders = [
-        full_adder(l_gate, l_overlap, w_mesa, r_type=r_type)
+        cells.full_adder(l_gate, l_overlap, w_mesa, r_type=r_type)
         for (l_gate, l_overlap, w_mesa, r_type) in r_full_adder_variants
     ]
     r_full_adders = [x for x in r_full_adders if "invalid" not in x.info]
     r_full_adder_test_structure = gf.grid(
         r_full_adders, shape=(len(r_full_adders), 6), spacing=(20, 10)
     )
+    memory.checkpoint("resistor full adders")
 
     # Full Adder - VDD
-    vdd_full_adder_variants = list(
-        itertools.product(
-            [5, 10, 20, 40],  # l_g
-            [5, 10],  # l_ov
-            [50, 100],  # w
-        )
-    )
+    vdd_full_adder_variants = VDD_FULL_ADDER_VARIANTS
 
     vdd_full_adders = [
-        full_adder(l_gate, l_overlap, w_mesa, split_vdd=True)
+        cells.full_adder(l_gate, l_overlap, w_mesa, split_vdd=True)
         for (l_gate, l_overlap, w_mesa) in vdd_full_adder_variants
     ]
     vdd_full_adders = [x for x in vdd_full_adders if "invalid" not in x.info]
     vdd_full_adder_test_structure = gf.grid(
         vdd_full_adders, shape=(len(vdd_full_adders), 6), spacing=(20, 10)
     )
+    memory.checkpoint("split VDD full adders")
+
+    # Test structures are drawn straight into their cells from the variant
+    # tables, see `pdk.bulk`. Floorplan boxes come from their generators.
+    draw = {}
+    if not floorplan:
+        draw = dict(
+            transistor_test=draw_transistor_test,
+            resistor_w_test=draw_resistor_w_test,
+            resistor_ito_test=draw_resistor_ito_test,
+            inverter_test=draw_inverter_test,
+        )
 
     # Transistor
-    transistors = [
-        transistor_test(l_gate, l_overlap, w_mesa)
-        for (l_gate, l_overlap, w_mesa) in t_variants
-    ]
-
-    transistor_test_structure = gf.grid(
-        transistors, shape=(len(transistors), 4), spacing=(50, 50)
+    transistor_test_structure = bulk.grid(
+        cells.transistor_test,
+        t_variants,
+        shape=(len(t_variants), 4),
+        spacing=(50, 50),
+        draw=draw.get("transistor_test"),
     )
+    memory.checkpoint("transistors")
 
     # Resistor
-    r_variants_w = [100, 200, 500, 1000, 2000, 5000, 10000]
-    resistors_w = [resistor_w_test(l) for l in r_variants_w]
+    r_variants_w = R_VARIANTS_W
+    resistors_w = bulk.devices(
+        cells.resistor_w_test, r_variants_w, draw=draw.get("resistor_w_test")
+    )
 
-    r_variants_ito = [0.05, 0.1, 0.2, 0.5, 1, 2, 5]
-    resistors_ito = [resistor_ito_test(l) for l in r_variants_ito]
+    r_variants_ito = R_VARIANTS_ITO
+    resistors_ito = bulk.devices(
+        cells.resistor_ito_test, r_variants_ito, draw=draw.get("resistor_ito_test")
+    )
 
     resistors = resistors_w + resistors_ito
     resistor_test_structure = gf.grid(
@@ -703,24 +819,29 @@ def main():
         shape=(len(resistors), 1),
         spacing=50,
     )
+    memory.checkpoint("resistors")
 
     # Inverters & NAND Gates
 
-    inverters = [
-        inverter_test(l_gate, l_overlap, w_mesa, n_transistors=1)
-        for (l_gate, l_overlap, w_mesa) in t_variants
-    ]
-    inverter_test_structure = gf.grid(
-        inverters, shape=(len(inverters), 8), spacing=(50, 50)
+    inverter_test_structure = bulk.grid(
+        cells.inverter_test,
+        t_variants,
+        shape=(len(t_variants), 8),
+        spacing=(50, 50),
+        draw=draw.get("inverter_test"),
+        n_transistors=1,
     )
-
-    nand_gates = [
-        inverter_test(l_gate, l_overlap, w_mesa, n_transistors=2)
-        for (l_gate, l_overlap, w_mesa) in t_variants
-    ]
-    nand_gates_test_structure = gf.grid(
-        nand_gates, shape=(len(nand_gates), 8), spacing=(50, 50)
+    memory.checkpoint("inverters")
+
+    nand_gates_test_structure = bulk.grid(
+        cells.inverter_test,
+        t_variants,
+        shape=(len(t_variants), 8),
+        spacing=(50, 50),
+        draw=draw.get("inverter_test"),
+        n_transistors=2,
     )
+    memory.checkpoint("NAND gates")
 
     # Final Packing
     # 8x8mm blocks
@@ -744,19 +865,66 @@ def main():
             spacing=150,
         )
     )
+    memory.checkpoint("block C")
 
     # Final Layout
-    for i, block in enumerate([block_a, block_b, block_c] * 3):
-        b = c << block
-        b.x = (i % 3 + 0.5) * 10000
-        b.y = (i // 3 + 0.5) * 10000
-
-        # assert b.bbox().width() <= 10000
-        # assert b.bbox().height() <= 10000
+    if wafer is None:
+        dies = [(i % 3, i // 3) for i in range(9)]
+    else:
+        dies = die_map(wafer, pitch=10000)
+    step(c, [block_a, block_b, block_c], dies, pitch=10000)
+    memory.checkpoint("stepping")
+
+    if floorplan:
+        boxes.save()
+        print(f"Floorplan of {len(boxes.cells)} cells, {boxes.built} built")
+        for name, block in zip("ABC", [block_a, block_b, block_c]):
+            fits = "" if max(block.xsize, block.ysize) <= 10000 else "  too large"
+            print(f"Block {name}: {block.xsize:.0f} x {block.ysize:.0f} um{fits}")
+        c.write_gds("full_adder_floorplan.gds")
+        return
 
     c.show()
     c.write_gds("full_adder.gds")
+    memory.checkpoint("write GDS")
+
+    if manifest:
+        from analysis import manifest as probes
+
+        rows = probes.manifest(c, pitch=10000)
+        probes.write_manifest(rows, "full_adder_probes.csv")
+        memory.checkpoint("probe manifest")
+    if profile_memory:
+        memory.report()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--plan", action="store_true", help="choose variants from measurements"
+    )
+    parser.add_argument(
+        "--wafer", type=float, default=None, help="step a wafer of this diameter (um)"
+    )
+    parser.add_argument(
+        "--profile-memory", action="store_true", help="print a memory report"
+    )
+    parser.add_argument(
+        "--memory-budget", type=float, default=None, help="maximum RSS (MB)"
+    )
+    parser.add_argument(
+        "--floorplan", action="store_true", help="only place bounding boxes"
+    )
+    parser.add_argument(
+        "--manifest", action="store_true", help="write the probe pad manifest"
+    )
+    args = parser.parse_args()
+
+    main(
+        plan=args.plan,
+        wafer=args.wafer,
+        profile_memory=args.profile_memory,
+        memory_budget=args.memory_budget,
+        floorplan=args.floorplan,
+        manifest=args.manifest,
+    )
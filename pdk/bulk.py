@@ -0,0 +1,151 @@
+import inspect
+from functools import cache
+
+import gdsfactory as gf
+import klayout.db as kdb
+from kfactory import KCellSettings
+from kfactory.serialization import get_cell_name
+
+from pdk.concurrency import LAYOUT_LOCK
+
+# Glyph tables of `gf.components.text`. They are private, so if a gdsfactory
+# release moves them the labels are built through the text component instead.
+try:
+    from gdsfactory.constants import _glyph, _indent, _width
+except ImportError:
+    _glyph = _indent = _width = None
+
+# Scratch layer of labels built through `gf.components.text`
+_TEXT_LAYER = (0, 0)
+
+
+@cache
+def text_region(text: str, size: float) -> kdb.Region:
+    """Polygons of ``gf.components.text(text, size)`` in dbu.
+
+    Same glyphs and line spacing as the text component, with every line left
+    aligned at x = 0, but without creating any cells. Falls back to the text
+    component if its glyph tables are not available.
+    """
+    if _glyph is None:
+        c = gf.components.text(text, size, layer=_TEXT_LAYER)
+        return kdb.Region(c.begin_shapes_rec(gf.get_layer(_TEXT_LAYER)))
+
+    dbu = gf.kcl.dbu
+    scaling = size / 1000
+    region = kdb.Region()
+    y = 0.0
+    for line in text.split("\n"):
+        label = kdb.Region()
+        x = 0.0
+        for char in line:
+            if char == " ":
+                x += 500 * scaling
+                continue
+            for poly in _glyph[ord(char)]:
+                points = [
+                    kdb.DPoint(px * scaling + x, py * scaling + y) for px, py in poly
+                ]
+                label.insert(kdb.DPolygon(points).to_itype(dbu))
+            x += (_width[ord(char)] + _indent[ord(char)]) * scaling
+        if not label.is_empty():
+            region += label.moved(-label.bbox().left, 0)
+        y -= 1500 * scaling
+    return region
+
+
+def add_text(
+    c: gf.Component,
+    text: str,
+    size: float,
+    layers,
+    xmin: float,
+    ymin: float | None = None,
+    ymax: float | None = None,
+):
+    """Insert ``text`` into ``c`` as polygons, aligned like a text reference.
+
+    Args:
+        c: Component to draw into.
+        text: Text, lines separated by newlines.
+        size: Character height in um.
+        layers: Layers to write the text on.
+        xmin: Left edge of the text in um.
+        ymin: Bottom edge of the text in um, or
+        ymax: top edge of the text in um.
+    """
+    region = text_region(text, size)
+    dbu = c.kcl.dbu
+    box = region.bbox()
+    dx = round(xmin / dbu) - box.left
+    if ymax is None:
+        dy = round(ymin / dbu) - box.bottom
+    else:
+        dy = round(ymax / dbu) - box.top
+    region = region.moved(dx, dy)
+    for layer in layers:
+        c.shapes(gf.get_layer(layer)).insert(region)
+
+
+def _args(row) -> tuple:
+    return row if isinstance(row, (tuple, list)) else (row,)
+
+
+def devices(func, table, draw=None, **kwargs) -> list[gf.Component]:
+    """Build a ``func`` cell for every row of a parameter table.
+
+    With ``draw``, the cells are created directly instead of through the cell
+    decorator of ``func``, whose bookkeeping costs more than drawing a test
+    structure. The cells get the name, function name and settings the
+    decorator would give them, so they are shared with any ``func`` call of the
+    same parameters, before or after.
+
+    Args:
+        func: Cell function, e.g. `main.transistor_test`.
+        table: Positional arguments of ``func``, one tuple (or single value)
+            per cell.
+        draw: Function ``draw(c, **settings)`` that draws the ``func`` cell
+            into the empty component ``c``. Without it ``func`` is called.
+        kwargs: Keyword arguments of ``func`` common to all rows.
+    """
+    if draw is None:
+        return [func(*_args(row), **kwargs) for row in table]
+
+    signature = inspect.signature(func)
+    kcl = gf.kcl
+    components = []
+    with LAYOUT_LOCK:
+        for row in table:
+            bound = signature.bind(*_args(row), **kwargs)
+            bound.apply_defaults()
+            settings = dict(bound.arguments)
+            name = get_cell_name(func.__name__, **settings)
+            existing = kcl.layout_cell(name)
+            if existing is not None:
+                components.append(kcl.get_cell(existing.cell_index(), gf.Component))
+                continue
+
+            c = gf.Component(name)
+            draw(c, **settings)
+            c.function_name = func.__name__
+            c.settings = KCellSettings(**settings)
+            c.base.lock()
+            components.append(c)
+    return components
+
+
+def grid(func, table, shape=None, spacing=(5.0, 5.0), draw=None, **kwargs):
+    """Build a grid of ``func`` cells from a parameter table in one pass.
+
+    The cells are built with `devices` and placed like `gf.grid`.
+
+    Example:
+        >>> block = grid(
+        ...     transistor_test,
+        ...     T_VARIANTS,
+        ...     shape=(len(T_VARIANTS), 4),
+        ...     spacing=(50, 50),
+        ...     draw=draw_transistor_test,
+        ... )
+    """
+    return gf.grid(devices(func, table, draw, **kwargs), shape=shape, spacing=spacing)
@@ -1,11 +1,12 @@
 import gdsfactory as gf
 import numpy as np
 
+from pdk.concurrency import cell
 from pdk.cross_section import metal_routing_ni, metal_routing_w
 from pdk.layer_map import LAYER
 
 
-@gf.cell
+@cell
 def resistance_meander(
     pad_size=(50.0, 50.0),
     num_squares: int = 1000,
@@ -92,7 +93,7 @@ def resistance_meander(
     return P
 
 
-@gf.cell
+@cell
 def resistor(
     length=100,
     width=20,
@@ -155,7 +156,7 @@ def resistor(
     return c
 
 
-@gf.cell
+@cell
 def resistor_ito(length=1, width=20):
     c = gf.Component()
 
@@ -218,7 +219,11 @@ def resistor_ito(length=1, width=20):
     return c
 
 
-@gf.cell
+def compute_l_mesa(l_gate: float, l_overlap: float):
+    return l_overlap * 2 + l_gate - 1
+
+
+@cell
 def transistor(l_mesa=8.0, l_gate=2.0, l_overlap=2.0, w_mesa=12.0):
     """Creates an ITO-based transistor layout.
 
@@ -262,7 +267,7 @@ def transistor(l_mesa=8.0, l_gate=2.0, l_overlap=2.0, w_mesa=12.0):
     return c
 
 
-@gf.cell
+@cell
 def via(size=(20, 20), inset=2) -> gf.Component:
     c = gf.Component()
     t = c << gf.components.pad(size, layer=LAYER.NI_CONTACTS)
@@ -280,7 +285,7 @@ def via(size=(20, 20), inset=2) -> gf.Component:
     return c
 
 
-@gf.cell
+@cell
 def crossing_ni() -> gf.Component:
     """
         |
@@ -321,6 +326,6 @@ def crossing_ni() -> gf.Component:
     return c
 
 
-@gf.cell
+@cell
 def straight(**kwargs) -> gf.Component:
     return gf.components.straight(**kwargs)
@@ -0,0 +1,33 @@
+import threading
+from functools import partial, wraps
+
+import gdsfactory as gf
+
+# KLayout layouts are not thread-safe, so every cell build, including the cell
+# cache lookup, holds this lock. It is re-entrant since cells build other cells.
+# Builds are serialized: this makes calling cells from several threads safe, it
+# does not make them faster. Layout changes outside of a cell, such as the
+# `gf.grid` calls and `c << ...` on the top-level component in `main()`, do not
+# hold the lock and must stay on a single thread.
+LAYOUT_LOCK = threading.RLock()
+
+
+def cell(func=None, /, **kwargs):
+    """Thread-safe version of `gf.cell`.
+
+    Accepts the same keyword arguments. The cached cell function runs under
+    `LAYOUT_LOCK`, so concurrent calls with the same parameters return the same
+    cell instead of racing to create two cells of the same name. Only one cell
+    is built at a time.
+    """
+    if func is None:
+        return partial(cell, **kwargs)
+
+    cached = gf.cell(func, **kwargs)
+
+    @wraps(cached)
+    def locked(*args, **kwargs):
+        with LAYOUT_LOCK:
+            return cached(*args, **kwargs)
+
+    return locked
@@ -0,0 +1,101 @@
+import hashlib
+import inspect
+import json
+from functools import wraps
+from pathlib import Path
+
+import gdsfactory as gf
+
+from pdk.layer_map import LAYER
+
+FLOORPLAN_PATH = Path(".cache/floorplan.json")
+
+
+def _source_hash(funcs) -> str:
+    """Hash the generator sources, so edits invalidate the cached boxes."""
+    files = {Path(inspect.getfile(inspect.unwrap(f))) for f in funcs}
+    files |= set(Path(__file__).parent.glob("*.py"))
+    sha1 = hashlib.sha1()
+    for path in sorted(files):
+        sha1.update(path.read_bytes())
+    return sha1.hexdigest()
+
+
+class Floorplan:
+    """Stand-ins for layout cells that only have their bbox and ports.
+
+    The bbox, ports and info of every cell are cached in ``path``. A cell that
+    is not cached yet is built once, afterwards only a box on the ``SI`` layer
+    with the ports of the cell is created. The cache is dropped whenever the
+    source of a generator or of `pdk` changes.
+
+    Example:
+        >>> floorplan = Floorplan([full_adder])
+        >>> full_adder = floorplan(full_adder)
+        >>> block = gf.grid([full_adder(l_gate=5), full_adder(l_gate=10)])
+        >>> floorplan.save()
+    """
+
+    def __init__(self, funcs, path=FLOORPLAN_PATH):
+        self.path = Path(path)
+        self.source = _source_hash(funcs)
+        self.cells = {}
+        if self.path.exists():
+            cache = json.loads(self.path.read_text())
+            if cache.get("source") == self.source:
+                self.cells = cache["cells"]
+        self.built = 0
+        self._boxes = {}
+
+    def __call__(self, func):
+        """Return the stand-in generator of the cell function ``func``."""
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def box(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = f"{func.__name__}({', '.join(map(repr, bound.arguments.values()))})"
+            if key not in self._boxes:
+                if key not in self.cells:
+                    self.cells[key] = self._metadata(func(*args, **kwargs))
+                    self.built += 1
+                self._boxes[key] = self._box(key, self.cells[key])
+            return self._boxes[key]
+
+        return box
+
+    @staticmethod
+    def _metadata(c: gf.Component) -> dict:
+        bbox = c.dbbox()
+        return {
+            "bbox": [bbox.left, bbox.bottom, bbox.right, bbox.top],
+            "ports": [
+                [p.name, p.center[0], p.center[1], p.orientation, p.width, p.port_type]
+                for p in c.ports
+            ],
+            "info": dict(c.info),
+        }
+
+    @staticmethod
+    def _box(key: str, metadata: dict) -> gf.Component:
+        c = gf.Component(f"floorplan_{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+        left, bottom, right, top = metadata["bbox"]
+        c.add_polygon(
+            [(left, bottom), (right, bottom), (right, top), (left, top)], layer=LAYER.SI
+        )
+        for name, x, y, orientation, width, port_type in metadata["ports"]:
+            c.add_port(
+                name,
+                center=(x, y),
+                orientation=orientation,
+                width=width,
+                layer=LAYER.SI,
+                port_type=port_type,
+            )
+        c.info.update(metadata["info"])
+        return c
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"source": self.source, "cells": self.cells}))
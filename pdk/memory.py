@@ -0,0 +1,119 @@
+import resource
+import sys
+import tracemalloc
+
+import gdsfactory as gf
+
+
+def rss() -> float:
+    """Return the resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:  # not Linux, fall back to the peak
+        return peak_rss()
+
+
+def peak_rss() -> float:
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def largest_cells(kcl=None, n: int = 10) -> list[tuple[str, int, int]]:
+    """Return the ``n`` cells with the most polygon points of their own.
+
+    Shapes in references are not counted, so the result points at the cells
+    that actually hold the geometry.
+
+    Returns:
+        List of (cell name, number of shapes, number of points).
+    """
+    kcl = kcl if kcl is not None else gf.kcl
+    counts = []
+    for cell in kcl.layout.each_cell():
+        shapes = points = 0
+        for index in kcl.layer_indexes():
+            for shape in cell.shapes(index).each():
+                shapes += 1
+                if not shape.is_text():
+                    points += shape.polygon.num_points()
+        counts.append((cell.name, shapes, points))
+    return sorted(counts, key=lambda x: -x[2])[:n]
+
+
+class MemoryProfile:
+    """Memory usage of the mask build, stage by stage.
+
+    Every `checkpoint` records the RSS and the number of cells in the layout
+    and, with ``trace``, the Python allocations of the stage. If the RSS
+    exceeds ``budget`` MB the build is stopped.
+
+    Example:
+        >>> profile = MemoryProfile(trace=True, budget=4000)
+        >>> full_adders = [full_adder(*v) for v in T_VARIANTS]
+        >>> profile.checkpoint("full adders")
+        >>> profile.report()
+    """
+
+    def __init__(self, trace: bool = False, budget: float | None = None, kcl=None):
+        self.trace = trace
+        self.budget = budget
+        self.kcl = kcl if kcl is not None else gf.kcl
+        self.stages = []
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._allocated = self._traced()
+        self._cells = self.kcl.layout.cells()
+
+    def _traced(self) -> float:
+        return tracemalloc.get_traced_memory()[0] / 2**20 if self.trace else 0.0
+
+    def checkpoint(self, stage: str):
+        """Record the memory usage after ``stage``.
+
+        Raises:
+            RuntimeError: If the RSS exceeds the budget.
+        """
+        allocated = self._traced()
+        cells = self.kcl.layout.cells()
+        self.stages.append(
+            {
+                "stage": stage,
+                "rss": rss(),
+                "allocated": allocated - self._allocated,
+                "cells": cells - self._cells,
+                "total_cells": cells,
+            }
+        )
+        self._allocated, self._cells = allocated, cells
+
+        if self.budget is not None and self.stages[-1]["rss"] > self.budget:
+            raise RuntimeError(
+                f"Memory budget of {self.budget:g} MB exceeded after {stage!r}: "
+                f"RSS {self.stages[-1]['rss']:.0f} MB"
+            )
+
+    def report(self, n: int = 10):
+        """Print the stages, the peak RSS and the largest cells."""
+        print(f"{'stage':24s} {'RSS MB':>8s} {'alloc MB':>9s} {'cells':>7s}")
+        for s in self.stages:
+            allocated = f"{s['allocated']:+9.1f}" if self.trace else f"{'-':>9s}"
+            print(
+                f"{s['stage']:24s} {s['rss']:8.0f} {allocated} "
+                f"{s['cells']:+7d}  ({s['total_cells']} total)"
+            )
+        print(f"Peak RSS {peak_rss():.0f} MB")
+
+        print("Largest cells by polygon points:")
+        for name, shapes, points in largest_cells(self.kcl, n):
+            name = name.replace("\n", "\\n")
+            print(f"  {points:9d} points {shapes:6d} shapes  {name}")
+
+        if self.trace:
+            print("Largest Python allocations:")
+            snapshot = tracemalloc.take_snapshot()
+            for stat in snapshot.statistics("lineno")[:n]:
+                print(f"  {stat.size / 2**20:8.1f} MB  {stat.traceback[0]}")
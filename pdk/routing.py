@@ -0,0 +1,87 @@
+import gdsfactory as gf
+
+from pdk.concurrency import cell
+
+
+def _port(name: str, center, orientation: float, width: float, layer) -> gf.Port:
+    return gf.Port(
+        name,
+        center=center,
+        orientation=orientation,
+        width=width,
+        layer=gf.get_layer(layer),
+        port_type="electrical",
+    )
+
+
+@cell
+def route(
+    end: tuple[float, float],
+    orientations: tuple[float, float],
+    widths: tuple[float, float],
+    layers: tuple,
+    cross_section,
+    start_straight_length: float = 0.0,
+    end_straight_length: float = 0.0,
+    bend=gf.components.wire_corner,
+) -> gf.Component:
+    """Electrical route from a port at the origin to a port at ``end``.
+
+    Args:
+        end: Position of the second port relative to the first one.
+        orientations: Orientations of both ports.
+        widths: Widths of both ports.
+        layers: Layers of both ports.
+        cross_section: Cross section of the route.
+        start_straight_length: Straight length at the first port.
+        end_straight_length: Straight length at the second port.
+        bend: Bend component.
+    """
+    c = gf.Component()
+    port_1 = _port("e1", (0, 0), orientations[0], widths[0], layers[0])
+    port_2 = _port("e2", end, orientations[1], widths[1], layers[1])
+    gf.routing.route_single(
+        c,
+        port_1,
+        port_2,
+        start_straight_length=start_straight_length,
+        end_straight_length=end_straight_length,
+        cross_section=cross_section,
+        bend=bend,
+        port_type="electrical",
+        allow_width_mismatch=True,
+    )
+    c.add_port("e1", port=port_1)
+    c.add_port("e2", port=port_2)
+    return c
+
+
+def route_cached(c: gf.Component, port_1, port_2, cross_section, **kwargs):
+    """Route ``port_1`` to ``port_2`` with a reference to a cached `route`.
+
+    Routes only depend on the relative position, orientations, widths and
+    layers of their ports, so every geometry is routed once and placed as a
+    translated reference afterwards.
+
+    Args:
+        c: Component to add the route to.
+        port_1: Start port.
+        port_2: End port.
+        cross_section: Cross section of the route.
+        kwargs: Keyword arguments of `route`.
+
+    Returns:
+        The route reference.
+    """
+    ports = (port_1, port_2)
+    end = (port_2.trans.disp - port_1.trans.disp).to_dtype(c.kcl.dbu)
+    ref = c << route(
+        end=(end.x, end.y),
+        orientations=tuple(p.orientation for p in ports),
+        widths=tuple(p.width for p in ports),
+        layers=tuple((p.layer_info.layer, p.layer_info.datatype) for p in ports),
+        cross_section=cross_section,
+        **kwargs,
+    )
+    ref.move(port_1.center)
+    return ref
@@ -0,0 +1,148 @@
+import gdsfactory as gf
+import numpy as np
+
+from pdk.concurrency import cell
+from pdk.layer_map import LAYER
+
+
+def die_map(diameter: float, pitch=10000, edge_exclusion: float = 3000) -> np.ndarray:
+    """Return the dies that fit on a round wafer.
+
+    Dies are stepped on a grid with a die corner at the wafer center, so die
+    ``(column, row)`` is centered at ``((column + 0.5) * pitch_x, (row + 0.5) *
+    pitch_y)``.
+
+    Args:
+        diameter: Wafer diameter in um.
+        pitch: Stepping pitch in um, a number or a (x, y) pair.
+        edge_exclusion: Width of the unusable wafer rim in um.
+
+    Returns:
+        Integer array of shape (n, 2) with the (column, row) of every die that
+        lies completely inside the usable area, sorted by row and column.
+    """
+    pitch = np.broadcast_to(np.asarray(pitch, dtype=float), (2,))
+    radius = diameter / 2 - edge_exclusion
+    n = np.ceil(radius / pitch).astype(int)
+    columns, rows = np.meshgrid(np.arange(-n[0], n[0]), np.arange(-n[1], n[1]))
+    dies = np.stack([columns.ravel(), rows.ravel()], axis=1)
+
+    # Farthest corner of every die from the wafer center
+    corner = np.maximum(np.abs(dies), np.abs(dies + 1)) * pitch
+    return dies[np.hypot(corner[:, 0], corner[:, 1]) <= radius]
+
+
+def _runs(dies: np.ndarray) -> list[tuple]:
+    """Split dies into rectangular arrays.
+
+    Dies of a row are split into runs of equal column step, and identical runs
+    of consecutive rows are merged.
+
+    Returns:
+        List of (column, row, columns, rows, column_step) arrays.
+    """
+    dies = dies[np.lexsort((dies[:, 0], dies[:, 1]))]
+    step = np.diff(np.unique(dies[:, 0]))
+    step = int(step.min()) if len(step) else 1
+
+    runs = []
+    for row in np.unique(dies[:, 1]):
+        columns = dies[dies[:, 1] == row, 0]
+        split = np.flatnonzero(np.diff(columns) != step) + 1
+        for run in np.split(columns, split):
+            runs.append((int(run[0]), int(row), len(run)))
+
+    # Extend the array of the previous row if it has the same columns
+    arrays = []
+    open_arrays = {}
+    for column, row, n in runs:
+        a = open_arrays.get((column, n))
+        if a is not None and arrays[a][1] + arrays[a][3] == row:
+            arrays[a] = arrays[a][:3] + (arrays[a][3] + 1, step)
+        else:
+            open_arrays[column, n] = len(arrays)
+            arrays.append((column, row, n, 1, step))
+    return arrays
+
+
+@cell
+def glyph(char: str, size: float, layers) -> gf.Component:
+    """Single text character on every layer of ``layers``."""
+    c = gf.Component()
+    for layer in layers:
+        c << gf.components.text(text=char, size=size, layer=layer)
+    return c
+
+
+def _label(c: gf.Component, text: str, origin, size: float, layers):
+    """Write ``text`` at ``origin`` as references to one cell per character.
+
+    Die IDs only use a few distinct characters, so this keeps the labels of a
+    full wafer about as small as the labels of a single die.
+    """
+    x, y = origin
+    for char in text:
+        g = glyph(char, size, tuple(layers))
+        ref = c << g
+        ref.move((x, y))
+        x += g.xsize + size / 4
+
+
+def step(
+    c: gf.Component,
+    blocks,
+    dies,
+    assignment=None,
+    pitch=10000,
+    label_size: float = 100,
+    label_layers=(LAYER.W_GATE, LAYER.NI_CONTACTS),
+) -> list:
+    """Step ``blocks`` over the ``dies`` of ``c``.
+
+    Every block is centered in its dies and placed with as few array
+    references as possible, so the block geometry is never copied. Each die
+    gets a small ``R<row>C<column>`` ID label in its lower left corner.
+
+    Args:
+        c: Component to add the references to.
+        blocks: Components to step.
+        dies: (column, row) pairs, e.g. from `die_map`.
+        assignment: Index into ``blocks`` per die. Defaults to cycling through
+            the blocks by column.
+        pitch: Stepping pitch in um, a number or a (x, y) pair.
+        label_size: Height of the ID labels in um, 0 for no labels.
+        label_layers: Layers the ID labels are written on.
+
+    Returns:
+        The block references.
+    """
+    dies = np.asarray(dies, dtype=int).reshape(-1, 2)
+    pitch = np.broadcast_to(np.asarray(pitch, dtype=float), (2,))
+    if assignment is None:
+        assignment = dies[:, 0] % len(blocks)
+    assignment = np.asarray(assignment, dtype=int)
+
+    refs = []
+    for i, block in enumerate(blocks):
+        center = block.dbbox().center()
+        for column, row, columns, rows, column_step in _runs(dies[assignment == i]):
+            ref = c.add_ref(
+                block,
+                columns=columns,
+                rows=rows,
+                column_pitch=column_step * pitch[0],
+                row_pitch=pitch[1],
+            )
+            ref.move(
+                (
+                    float((column + 0.5) * pitch[0] - center.x),
+                    float((row + 0.5) * pitch[1] - center.y),
+                )
+            )
+            refs.append(ref)
+
+    if label_size:
+        for column, row in dies:
+            origin = (column * pitch[0] + label_size, row * pitch[1] + label_size)
+            _label(c, f"R{row}C{column}", origin, label_size, label_layers)
+    return refs